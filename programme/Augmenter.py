@@ -0,0 +1,121 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE OF FILE: to add noise to the trainning images, so the kNN model
+doesn't over-fit to the provided trainning data. The noise of each image is
+drawn from a generator seeded by the key of that image, so the same
+trainning image always gives the same trainning features, regardless of
+which other images it's augmented with
+"""
+
+import hashlib
+import numpy as np
+from Errors import *
+
+class Augmenter(object):
+    """
+    The noise added to each pixel is drawn from a normal distribution with a
+    mean, and a standard deviation for each channel, and is clipped to the
+    range of a signed byte before it's added to the image. Each image can be
+    augmented into several copies, which each get different noise
+    """
+
+    def __init__(self, mean=(25, 25, 25), sigma=(200, 200, 200), copies=1,
+            seed=0):
+        self._mean = np.array(mean, dtype=np.float32)
+        self._sigma = np.array(sigma, dtype=np.float32)
+        self._copies = self.__validate_copies(copies)
+        self._seed = seed
+
+    #===========================ACCESORS========================================
+    @property
+    def copies(self):
+        return self._copies
+
+    @property
+    def seed(self):
+        return self._seed
+
+    @property
+    def params(self):
+        """
+        EXPORT: params (dictionary): everything which decides the noise which
+        is added to the images
+        """
+        return {
+            'noise_mean': self._mean.tolist(),
+            'noise_sigma': self._sigma.tolist(),
+            'copies': self._copies,
+            'seed': self._seed
+        }
+
+    #===========================PUBLIC METHODS==================================
+    def generator(self, key):
+        """
+        IMPORT: key (integer, string or None): which image the noise is for
+        EXPORT: numpy random generator
+
+        PURPOSE: to make the generator of an image from the seed, and the key
+        of the image, so an image gets the same noise regardless of which
+        process augments it. A key of None gets a generator which isn't
+        seeded, hence new noise every time
+        """
+        if key is None:
+            return np.random.default_rng()
+        if isinstance(key, str):
+            #hash of a string changes between processes, a digest doesn't
+            key = int.from_bytes(hashlib.sha1(key.encode()).digest()[:8],
+                    'little')
+        return np.random.default_rng([self._seed, key])
+
+    def augment(self, images, keys=None):
+        """
+        IMPORT: images (list of uint8 numpy arrays)
+                keys (list): the key of each image (see generator), None
+                uses the position of each image in the list
+        EXPORT: augmented (list of uint8 numpy arrays)
+
+        PURPOSE: to add noise to every image of a batch. The noise of each
+        image is drawn from its own generator into one array for the whole
+        batch, which is then scaled in one go. Hence, the noise of an image
+        only depends on its key, and not on the batch which it's in
+        """
+        if not images:
+            return []
+        if keys is None:
+            keys = range(len(images))
+
+        channels = images[0].shape[2] if images[0].ndim == 3 else 1
+        sizes = [im.size for im in images]
+        noise = np.empty(sum(sizes), dtype=np.float32)
+        start = 0
+        for key, size in zip(keys, sizes):
+            self.generator(key).standard_normal(size, dtype=np.float32,
+                    out=noise[start:start + size])
+            start += size
+        noise = noise.reshape(-1, channels)
+        #scaling the whole batch at once, a single channel image gets the
+        #mean and the standard deviation of the first channel
+        noise *= self._sigma[:channels]
+        noise += self._mean[:channels]
+        np.rint(noise, out=noise)
+        np.clip(noise, -128, 127, out=noise)
+        noise = noise.ravel()
+
+        augmented = []
+        start = 0
+        for im, size in zip(images, sizes):
+            im_noise = noise[start:start + size].reshape(im.shape)
+            start += size
+            im_noise += im
+            augmented.append(np.clip(im_noise, 0, 255).astype(np.uint8))
+
+        return augmented
+
+    #===========================PRIVATE METHODS=================================
+    def __validate_copies(self, copies):
+        if not isinstance(copies, int) or copies <= 0:
+            raise ParameterError("number of copies must be a positive"+
+                    " integer: %s" % copies)
+        return copies
@@ -0,0 +1,116 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE OF FILE: to classify the digits with a cheap kNN model first, and to
+only classify the digits which the cheap model isn't confident about with
+the full kNN model. Hence, most clean digits are classified at a fraction of
+the cost of the full model, and the ambiguous digits keep the accuracy of
+the full model
+"""
+
+import numpy as np
+from Errors import *
+
+class Cascade(object):
+    """
+    A digit is accepted by the first stage when the vote of its neighbours
+    is won by at least min_margin (see Index.margin), and when its closest
+    neighbour is no further than max_dist, if max_dist is given. The
+    distances of the first stage are in the units of its own features, i.e.
+    the projected features of a PCA model. Both stages are Trainer objects
+    """
+
+    def __init__(self, first, second, min_margin=0.75, max_dist=None):
+        self._first = first
+        self._second = second
+        self._min_margin = self.__validate_margin(min_margin)
+        self._max_dist = max_dist
+        self._accepted = 0
+        self._deferred = 0
+
+    #===========================ACCESORS========================================
+    @property
+    def first(self):
+        return self._first
+
+    @property
+    def second(self):
+        return self._second
+
+    @property
+    def stats(self):
+        """
+        EXPORT: stats (dictionary): the number of digits which were accepted
+        by the first stage, and the number which were deferred to the second
+        """
+        total = self._accepted + self._deferred
+        return {
+            'accepted': self._accepted,
+            'deferred': self._deferred,
+            'accept_rate': float(self._accepted) / total if total else 0.0
+        }
+
+    #===========================PUBLIC METHODS==================================
+    def classify(self, images, k=8):
+        """
+        IMPORT: images (list of uint8 numpy arrays i.e. images), k (integer)
+        EXPORT: results (numpy array (n, 1)): the label of each image
+                dist (numpy array (n, k)): the distances to the neighbours of
+                the stage which labelled each image, inf where the stage has
+                less than k trainning samples
+
+        PURPOSE: to classify every image with the first stage, and to
+        classify the images which the first stage isn't confident about again
+        with the second stage
+        """
+        if len(images) == 0:
+            return (np.zeros((0, 1), dtype=np.float32),
+                    np.zeros((0, k), dtype=np.float32))
+
+        index = self._first.trainner
+        neighbours, first_dist = index.search(self._first.features(images), k)
+        results = index.vote(neighbours)
+        #either stage may have less trainning samples than k, hence the
+        #neighbours which a stage doesn't have are infinitely far away
+        dist = np.full((len(images), k), np.inf, dtype=np.float32)
+        dist[:, :first_dist.shape[1]] = first_dist
+
+        accept = index.margin(neighbours) >= self._min_margin
+        if self._max_dist is not None:
+            accept &= dist[:, 0] <= self._max_dist
+        deferred = np.flatnonzero(~accept)
+        self._accepted += len(images) - len(deferred)
+        self._deferred += len(deferred)
+
+        if len(deferred):
+            second_res, second_dist = self._second.classify(
+                    [images[ii] for ii in deferred], k)
+            results[deferred] = second_res
+            dist[deferred] = np.inf
+            dist[deferred, :second_dist.shape[1]] = second_dist
+
+        return results, dist
+
+    def classify_many(self, groups, k=8):
+        """
+        IMPORT: groups (list of lists of uint8 numpy arrays): the digits of
+                each image
+        EXPORT: list of (results, dist) tuples, one for each group
+
+        PURPOSE: to classify the digits of many images together, and to split
+        the results back up into the images which the digits came from
+        """
+        images = [im for group in groups for im in group]
+        results, dist = self.classify(images, k)
+        ends = np.cumsum([len(group) for group in groups])
+        starts = ends - [len(group) for group in groups]
+        return [(results[start:end], dist[start:end])
+                for start, end in zip(starts, ends)]
+
+    #===========================PRIVATE METHODS=================================
+    def __validate_margin(self, min_margin):
+        if not 0 <= min_margin <= 1:
+            raise ParameterError("the vote margin must be between 0 and 1: %s"
+                    % min_margin)
+        return min_margin
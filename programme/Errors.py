@@ -36,3 +36,19 @@ class ImageError(Error):
     """
     def __init__(self, mssg):
         self.mssg = red + "ERROR " + reset + mssg
+
+class ParameterError(Error):
+    """
+    ERROR raised when a parameter which is passed into a class or a method
+    isn't a valid value for that parameter
+    """
+    def __init__(self, mssg):
+        self.mssg = red + "ERROR " + reset + mssg
+
+class StoreError(Error):
+    """
+    ERROR raised when a feature store doesn't exist, or it was written in a
+    format which this programme can't read
+    """
+    def __init__(self, mssg):
+        self.mssg = red + "ERROR " + reset + mssg
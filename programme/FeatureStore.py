@@ -0,0 +1,336 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE OF FILE: to store the trainning features, and their labels on disk in
+a format which can be memory mapped. Hence, the trainning matrix doesn't have
+to be un-pickled and copied before it can be used, and many processes can
+share the same pages of the file instead of each having their own copy
+"""
+
+import os
+import json
+import shutil
+import numpy as np
+from Errors import *
+
+class Feature_Store(object):
+    """
+    A store is a directory which contains:
+        header.json : the version of the format, the number of rows, the data
+                      type and the shape of each array, and any meta-data
+                      about how the features were made
+        features.bin : the raw row-major bytes of the trainning matrix
+        labels.bin : the raw bytes of the labels, one per row
+        sources.json : (optional) the image which each row was made from, so
+                       the rows of images which have changed can be found
+
+    The header is removed before any array of the store is replaced, and is
+    always written last. Hence, a store is only seen by a reader once all of
+    its arrays have been written, and a reader never pairs the new arrays
+    with the header of the old arrays
+    """
+
+    version = 1
+    header_name = "header.json"
+    sources_name = "sources.json"
+    arrays = ("features", "labels")
+
+    def __init__(self, path):
+        self._path = path
+        self._header = None
+        #the header of the arrays made by create or extend, which haven't
+        #been committed yet
+        self._pending = None
+        #true if the pending arrays were made by create, and have to replace
+        #the arrays of the store when they're committed
+        self._pending_replace = False
+
+    #===========================ACCESORS========================================
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def header(self):
+        if self._header is None:
+            self._header = self.__read_header()
+        return self._header
+
+    @property
+    def metadata(self):
+        return self.header['metadata']
+
+    @property
+    def rows(self):
+        return self.header['rows']
+
+    @property
+    def sources(self):
+        """
+        EXPORT: sources (list) or None if the store doesn't have any sources
+
+        PURPOSE: the source of each row, as it was given to write or commit
+        """
+        try:
+            with open(os.path.join(self._path, self.sources_name)) as inStrm:
+                return json.load(inStrm)
+        except (OSError, ValueError):
+            return None
+
+    #===========================PUBLIC METHODS==================================
+    def exists(self):
+        """
+        EXPORT: boolean
+
+        PURPOSE: to determine if a complete store, written by this version of
+        the class, exists at the path of this object
+        """
+        try:
+            self._header = self.__read_header()
+        except StoreError:
+            return False
+        return True
+
+    def open(self):
+        """
+        EXPORT: features (numpy memmap), labels (numpy memmap)
+
+        PURPOSE: to open the arrays of the store as read only memory maps.
+        Nothing is read from the disk until the pages of the arrays are
+        accessed
+        """
+        header = self.header
+        return tuple(self.__map(name, header, 'r') for name in self.arrays)
+
+    def write(self, features, labels, metadata=None, sources=None):
+        """
+        IMPORT: features (2D numpy array), labels (1D numpy array),
+                metadata (dictionary), sources (list, one for each row)
+
+        PURPOSE: to write the trainning matrix, and the labels to the store,
+        replacing anything which was in the store before
+        """
+        features = np.ascontiguousarray(features)
+        labels = np.ascontiguousarray(labels)
+        if features.ndim != 2 or labels.shape != (features.shape[0],):
+            raise StoreError("""
+            the features must be a matrix with one label for each row:
+            features shape: %s
+            labels shape: %s
+            """ % (features.shape, labels.shape))
+
+        os.makedirs(self._path, exist_ok=True)
+        self.__remove_header()
+        header = {'version': self.version, 'rows': features.shape[0],
+                'metadata': metadata or {}}
+
+        for name, arr in zip(self.arrays, (features, labels)):
+            file_name = os.path.join(self._path, name + '.bin')
+            #writing to a new file and then replacing the old one, as other
+            #processes may still have the old file memory mapped
+            with open(self.temp_file(name), 'wb') as outStrm:
+                arr.tofile(outStrm)
+            os.replace(self.temp_file(name), file_name)
+            header[name] = {'dtype': arr.dtype.str, 'shape': arr.shape[1:]}
+
+        self.__write_sources(sources)
+        self.__write_header(header)
+
+    def create(self, rows, shape, dtype=np.float32, labels_dtype=np.float32):
+        """
+        IMPORT: rows (integer), shape (tuple): the shape of each row,
+                dtype, labels_dtype (numpy data types)
+        EXPORT: features (numpy memmap), labels (numpy memmap)
+
+        PURPOSE: to allocate the arrays of a new store on the disk, so they
+        can be filled in place (by this process, or by other processes which
+        open the files from temp_file). The new arrays aren't seen by readers
+        of the store until commit is called
+        """
+        os.makedirs(self._path, exist_ok=True)
+        self._pending_replace = True
+        self._pending = {
+            'version': self.version, 'rows': rows,
+            'features': {'dtype': np.dtype(dtype).str, 'shape': tuple(shape)},
+            'labels': {'dtype': np.dtype(labels_dtype).str, 'shape': ()}
+        }
+
+        arrays = []
+        for name in self.arrays:
+            info = self._pending[name]
+            file_name = self.temp_file(name)
+            #numpy can't memory map an empty file
+            if rows == 0:
+                open(file_name, 'wb').close()
+                arrays.append(np.zeros((0,) + info['shape'], info['dtype']))
+            else:
+                arrays.append(np.memmap(file_name, dtype=info['dtype'],
+                    mode='w+', shape=(rows,) + info['shape']))
+
+        return tuple(arrays)
+
+    def temp_file(self, name):
+        """
+        IMPORT: name (string): one of the names inside of arrays
+        EXPORT: file_name (string)
+
+        PURPOSE: the file which an array made by create is written to, before
+        it has been committed
+        """
+        return os.path.join(self._path, name + '.bin.tmp')
+
+    def extend(self, extra_rows, rewrite=False):
+        """
+        IMPORT: extra_rows (integer)
+                rewrite (boolean): true if any of the old rows are going to
+                be written over as well
+        EXPORT: features (numpy memmap), labels (numpy memmap)
+
+        PURPOSE: to add rows onto the end of the arrays of the store, and to
+        open the arrays so the new rows can be written in place. Readers
+        won't see the new rows until commit is called. When old rows are
+        written over, the arrays are copied to their temporary files first,
+        and the copies replace the arrays when they're committed. Hence, a
+        reader which has already mapped the store never sees its rows change
+        """
+        header = json.loads(json.dumps(self.header))
+        old_rows = header['rows']
+        header['rows'] = old_rows + extra_rows
+
+        for name in self.arrays:
+            info = header[name]
+            row_bytes = np.dtype(info['dtype']).itemsize * \
+                    int(np.prod(info['shape'], dtype=np.int64))
+            file_name = os.path.join(self._path, name + '.bin')
+            if rewrite:
+                shutil.copyfile(file_name, self.temp_file(name))
+                file_name = self.temp_file(name)
+            #growing the file, readers which have already mapped the file
+            #will still be able to read the rows which they know about
+            with open(file_name, 'ab') as outStrm:
+                outStrm.truncate(header['rows'] * row_bytes)
+
+        self._pending = header
+        self._pending_replace = rewrite
+        return tuple(self.__map(name, header, 'r+', self.pending_file(name))
+                for name in self.arrays)
+
+    def pending_file(self, name):
+        """
+        IMPORT: name (string): one of the names inside of arrays
+        EXPORT: file_name (string)
+
+        PURPOSE: the file which the array made by create or extend is written
+        to, so other processes can open it before it has been committed
+        """
+        if self._pending_replace:
+            return self.temp_file(name)
+        return os.path.join(self._path, name + '.bin')
+
+    def commit(self, metadata=None, sources=None):
+        """
+        IMPORT: metadata (dictionary), sources (list, one for each row)
+
+        PURPOSE: to replace the arrays of the store with the arrays made by
+        create, or to make the rows added by extend seen. Then write the
+        header so readers can see the new arrays
+        """
+        header = self._pending
+        if header is None:
+            raise StoreError("create or extend must be called before commit")
+
+        if self._pending_replace:
+            self.__remove_header()
+            for name in self.arrays:
+                file_name = os.path.join(self._path, name + '.bin')
+                os.replace(self.temp_file(name), file_name)
+
+        header['metadata'] = metadata or {}
+        self._pending = None
+        self.__write_sources(sources)
+        self.__write_header(header)
+
+    #===========================PRIVATE METHODS=================================
+    def __map(self, name, header, mode, file_name=None):
+        """
+        IMPORT: name (string), header (dictionary), mode (string),
+                file_name (string): None maps the array of the store
+        EXPORT: numpy memmap
+
+        PURPOSE: to memory map one of the arrays of the store
+        """
+        info = header[name]
+        shape = (header['rows'],) + tuple(info['shape'])
+        if file_name is None:
+            file_name = os.path.join(self._path, name + '.bin')
+        #numpy can't memory map an empty file
+        if header['rows'] == 0:
+            return np.zeros(shape, dtype=info['dtype'])
+        return np.memmap(file_name, dtype=info['dtype'], mode=mode,
+                shape=shape)
+
+    def __read_header(self):
+        """
+        EXPORT: header (dictionary)
+
+        PURPOSE: to read the header of the store, and to validate that it was
+        written by this version of the class
+        """
+        header_file = os.path.join(self._path, self.header_name)
+        try:
+            with open(header_file, 'r') as inStrm:
+                header = json.load(inStrm)
+        except (OSError, ValueError):
+            raise StoreError("no feature store found at: %s" % self._path)
+
+        if header.get('version') != self.version:
+            raise StoreError("""
+            feature store version of:
+            %s
+            this programme can only read version:
+            %s
+            """ % (header.get('version'), self.version))
+
+        return header
+
+    def __write_sources(self, sources):
+        """
+        IMPORT: sources (list) or None
+
+        PURPOSE: to write the source of each row next to the arrays, or to
+        remove the sources of an older store if there aren't any sources
+        """
+        sources_file = os.path.join(self._path, self.sources_name)
+        if sources is None:
+            if os.path.exists(sources_file):
+                os.remove(sources_file)
+            return
+
+        with open(sources_file + '.tmp', 'w') as outStrm:
+            json.dump(sources, outStrm)
+        os.replace(sources_file + '.tmp', sources_file)
+
+    def __remove_header(self):
+        """
+        PURPOSE: to stop readers from opening the store whilst its arrays are
+        been replaced. The store doesn't exist until the new header is written
+        """
+        try:
+            os.remove(os.path.join(self._path, self.header_name))
+        except FileNotFoundError:
+            pass
+        self._header = None
+
+    def __write_header(self, header):
+        """
+        IMPORT: header (dictionary)
+
+        PURPOSE: to write the header of the store. The header is written to a
+        temporary file first, so a reader will never see half of a header
+        """
+        header_file = os.path.join(self._path, self.header_name)
+        with open(header_file + '.tmp', 'w') as outStrm:
+            json.dump(header, outStrm)
+        os.replace(header_file + '.tmp', header_file)
+        self._header = header
@@ -0,0 +1,142 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE OF FILE: to define the features which are made out of each padded,
+and resized digit. The features are made by both the trainning of the kNN
+model and the classification of the digits, so they're always made the same
+way
+"""
+
+import numpy as np
+import cv2 as cv
+from Errors import *
+
+class Feature_Extractor(object):
+    """
+    The base class of the feature extractors. A sub-class defines the length
+    of its features, and how the features are made out of one digit
+    """
+
+    name = None
+    extractors = {}
+    #the largest value which a feature can have, so the features can be
+    #scaled to fit inside of a compact data type
+    max_value = 255.0
+    #the channel which is kept as the grayscale of each mode which isn't
+    #converted to grayscale, i.e. the value, or the lightness channel
+    gray_channel = {'HSV': 2, 'LUV': 0, 'LAB': 0}
+    gray_conversion = {'BGR': cv.COLOR_BGR2GRAY, 'RGB': cv.COLOR_RGB2GRAY}
+
+    def __init__(self, mode, size):
+        #mode is the mode which the digits were loaded in, and size is the
+        #(width, height) which the digits have been resized to
+        self._mode = mode
+        self._size = tuple(size)
+
+    #===========================ACCESORS========================================
+    @property
+    def mode(self):
+        return self._mode
+
+    @property
+    def size(self):
+        return self._size
+
+    #===========================PUBLIC METHODS==================================
+    @classmethod
+    def register(cls, extractor):
+        """
+        IMPORT: extractor (sub-class of Feature_Extractor)
+        EXPORT: extractor
+        """
+        cls.extractors[extractor.name] = extractor
+        return extractor
+
+    @classmethod
+    def create(cls, name, mode, size):
+        """
+        IMPORT: name (string): one of the names inside of extractors
+                mode (string), size (tuple)
+        EXPORT: extractor (Feature_Extractor)
+        """
+        if name not in cls.extractors:
+            raise ParameterError("""
+            feature extractor of:
+            %s
+            the feature extractor must be one of these:
+            %s
+            """ % (name, sorted(cls.extractors)))
+        return cls.extractors[name](mode, size)
+
+    def gray(self, im):
+        """
+        IMPORT: im (numpy array of uint8)
+        EXPORT: im (2D numpy array of uint8)
+
+        PURPOSE: to get a single channel of the digit, in whichever mode it
+        was loaded in
+        """
+        if im.ndim == 2:
+            return im
+        if self._mode in self.gray_channel:
+            return np.ascontiguousarray(im[:, :, self.gray_channel[self._mode]])
+        return cv.cvtColor(im, self.gray_conversion.get(self._mode,
+            cv.COLOR_BGR2GRAY))
+
+
+@Feature_Extractor.register
+class Pixel_Features(Feature_Extractor):
+    """
+    The raw pixels of the digit, in the mode which it was loaded in
+    """
+
+    name = 'pixels'
+
+    def length(self):
+        channels = 1 if self._mode == 'GRAY' else 3
+        width, height = self._size
+        return width * height * channels
+
+    def extract(self, im):
+        """
+        IMPORT: im (numpy array of uint8): the padded, and resized digit
+        EXPORT: features (1D numpy array)
+        """
+        return im.ravel()
+
+
+@Feature_Extractor.register
+class HOG_Features(Feature_Extractor):
+    """
+    The histogram of oriented gradients of the grayscale digit. The digit is
+    split into a 4 by 4 grid of cells, and the histograms of each 2 by 2
+    block of cells are normalised. The gradients don't depend on the colour
+    of the background, and there is far less of them than pixels
+    """
+
+    name = 'hog'
+    max_value = 1.0
+    bins = 9
+
+    def __init__(self, mode, size):
+        super().__init__(mode, size)
+        width, height = self._size
+        cell = (width // 4, height // 4)
+        block = (cell[0] * 2, cell[1] * 2)
+        self._hog = cv.HOGDescriptor((cell[0] * 4, cell[1] * 4), block, cell,
+                cell, self.bins)
+
+    def length(self):
+        return self._hog.getDescriptorSize()
+
+    def extract(self, im):
+        """
+        IMPORT: im (numpy array of uint8): the padded, and resized digit
+        EXPORT: features (1D numpy array of float32)
+        """
+        im = self.gray(im)
+        width, height = self._hog.winSize
+        if im.shape[:2] != (height, width):
+            im = cv.resize(im, (width, height))
+        return self._hog.compute(im).ravel()
@@ -17,6 +17,12 @@ import cv2 as cv
 from statistics import mode
 
 class Image(object):
+    #images which are larger than resize_limit in both dimensions are shrunk
+    #down to resize_dims (width, height) before the region of interest is
+    #searched for
+    resize_limit = (900, 900)
+    resize_dims = (536, 884)
+
     def __init__(self, im, img_id):
         #set this to true, if you want to see each step of the image
         #segmentation process
@@ -83,9 +89,10 @@ class Image(object):
         #to determine if we need to re-adjust our bounding boxes to meet the
         #sepcifications of the original images
         resized = False
-        if im.shape[0] > 900 and im.shape[1] > 900:
+        if im.shape[0] > self.resize_limit[1] and \
+        im.shape[1] > self.resize_limit[0]:
             resized = True
-            im = self.resize_image(im, 536, 884)
+            im = self.resize_image(im, *self.resize_dims)
 
         #makind sure that we have actually passed in an image, and not anything
         #else
@@ -105,7 +112,6 @@ class Image(object):
 
         #this doesn't really have any performance boost to be honest
         canny_trans = cv.Canny(thresh, edge_thresh, edge_thresh * 2)
-        cv.waitKey()
         #getting the shape and size of the structual element suitable to this
         #image. Hence, the window which is going over this image
         rect_kern = cv.getStructuringElement(cv.MORPH_RECT, (5,5))
@@ -297,7 +303,27 @@ class Image(object):
         row_pad = 3
         col_pad = 3
         npad = ((row_pad, col_pad), (row_pad, col_pad), (0,0))
-        return np.pad(im, pad_width=npad, mode='constant', constant_values=0)
+        #a grayscale image doesn't have a channel axis to pad
+        return np.pad(im, pad_width=npad[:im.ndim], mode='constant',
+                constant_values=0)
+
+    def binarise(self, im):
+        """
+        IMPORT: im : numpy array of datatype unit8
+        EXPORT: binary image: 2D numpy array of datatype unit8
+
+        PURPOSE: it's to threshold a digit into a white digit on a black
+        background, so the digit is the same regardless of its colour, and
+        the colour of its background
+        """
+        if im.ndim == 3:
+            im = cv.cvtColor(im, cv.COLOR_BGR2GRAY)
+        thresh = cv.threshold(im, 0, 255, cv.THRESH_BINARY+cv.THRESH_OTSU)[1]
+        #the digit takes up less of the image than the background, hence if
+        #most of the image is white then the digit is dark
+        if cv.countNonZero(thresh) * 2 > thresh.size:
+            thresh = cv.bitwise_not(thresh)
+        return thresh
 
     def filter_heights(self, bboxes):
         """
@@ -0,0 +1,119 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE OF FILE: a least recently used cache of decoded images, which is
+limited by the number of bytes of the images inside of it. Hence, loops which
+load the same images over and over again only have to decode each image once,
+as long as all of the images fit inside of the budget
+"""
+
+import threading
+from collections import OrderedDict
+from Errors import *
+
+class Image_Cache(object):
+    """
+    The cache can be shared by many Image_Loader objects, and by the worker
+    threads which prefetch the images. The images inside of the cache are
+    made read only, so a consumer can't change the image which the next
+    consumer will get back
+    """
+
+    def __init__(self, budget):
+        #budget is the maximum number of bytes of images kept in the cache
+        self._budget = self.__validate_budget(budget)
+        self._images = OrderedDict()
+        self._size = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    #===========================ACCESORS========================================
+    @property
+    def budget(self):
+        return self._budget
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def hits(self):
+        return self._hits
+
+    @property
+    def misses(self):
+        return self._misses
+
+    #===========================PUBLIC METHODS==================================
+    def get(self, key):
+        """
+        IMPORT: key (hashable)
+        EXPORT: im (numpy array) or None if the image isn't in the cache
+
+        PURPOSE: to get an image out of the cache, and to mark it as the most
+        recently used image
+        """
+        with self._lock:
+            im = self._images.get(key)
+            if im is None:
+                self._misses += 1
+            else:
+                self._images.move_to_end(key)
+                self._hits += 1
+            return im
+
+    def put(self, key, im):
+        """
+        IMPORT: key (hashable), im (numpy array)
+
+        PURPOSE: to add an image to the cache, removing the least recently
+        used images until the image fits inside of the budget. An image which
+        is larger than the whole budget isn't cached
+        """
+        if im is None or im.nbytes > self._budget:
+            return
+
+        im.flags.writeable = False
+        with self._lock:
+            old = self._images.pop(key, None)
+            if old is not None:
+                self._size -= old.nbytes
+
+            while self._images and self._size + im.nbytes > self._budget:
+                evicted = self._images.popitem(last=False)[1]
+                self._size -= evicted.nbytes
+
+            self._images[key] = im
+            self._size += im.nbytes
+
+    def clear(self):
+        """
+        PURPOSE: to remove every image from the cache, and to reset the hit
+        and miss counters
+        """
+        with self._lock:
+            self._images.clear()
+            self._size = 0
+            self._hits = 0
+            self._misses = 0
+
+    def __len__(self):
+        return len(self._images)
+
+    def __contains__(self, key):
+        return key in self._images
+
+    #===========================PRIVATE METHODS=================================
+    def __validate_budget(self, budget):
+        """
+        IMPORT: budget (integer)
+        EXPORT: budget (integer)
+
+        PURPOSE: to validate that the budget is a positive number of bytes
+        """
+        if not isinstance(budget, int) or budget <= 0:
+            raise ParameterError("cache budget must be a positive number of"+
+                    " bytes: %s" % budget)
+        return budget
@@ -8,9 +8,20 @@ path and will only load the images when needed instead of loading all the images
 in memory at once.
 """
 
+import io
 import os
+import sys
+import struct
+import posixpath
+import threading
+import zipfile
 import cv2 as cv
+import numpy as np
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from Errors import *
+from Manifest import *
+from ImageCache import *
 
 class Image_Loader(object):
     """
@@ -20,14 +31,70 @@ class Image_Loader(object):
 
     ext = (".png", ".jpg", ".jpeg")
     modes = ('RGB', 'HSV', 'LUV', 'BGR', 'LAB', 'GRAY')
+    #the flag which each mode is decoded with, and the conversion which is
+    #needed after it's been decoded. GRAY is decoded straight to one channel
+    #so it doesn't need to be converted at all
+    mode_table = {
+        'BGR': (cv.IMREAD_COLOR, None),
+        'GRAY': (cv.IMREAD_GRAYSCALE, None),
+        'HSV': (cv.IMREAD_COLOR, cv.COLOR_BGR2HSV),
+        'LUV': (cv.IMREAD_COLOR, cv.COLOR_BGR2Luv),
+        'LAB': (cv.IMREAD_COLOR, cv.COLOR_BGR2Lab),
+        'RGB': (cv.IMREAD_COLOR, cv.COLOR_BGR2RGB)
+    }
+    #the flags which will make OpenCV decode a JPEG at a fraction of its size
+    #straight from the DCT co-efficients of the JPEG
+    reduced_flags = {
+        cv.IMREAD_COLOR: ((8, cv.IMREAD_REDUCED_COLOR_8),
+            (4, cv.IMREAD_REDUCED_COLOR_4), (2, cv.IMREAD_REDUCED_COLOR_2)),
+        cv.IMREAD_GRAYSCALE: ((8, cv.IMREAD_REDUCED_GRAYSCALE_8),
+            (4, cv.IMREAD_REDUCED_GRAYSCALE_4),
+            (2, cv.IMREAD_REDUCED_GRAYSCALE_2))
+    }
+    #the length of each image inside of a stream is written before the image
+    #as a 4 byte big-endian unsigned integer
+    frame_header = struct.Struct('>I')
+    #the start of frame markers of a JPEG, which holds the size of the image
+    sof_markers = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
 
     #choosing HSV as the defualt color channel as this typically gives better
     #results for image segementation
-    def __init__(self, path, mode="HSV"):
+    def __init__(self, path, mode="HSV", prefetch=0, workers=None,
+            manifest=False, size_hint=None, cache=None):
         self._path = path
         self._mode = mode
+        #an Image_Cache of decoded images, which can be shared with other
+        #loaders. None will decode every image each time it's loaded
+        self._cache = cache
+        #size_hint (width, height) is the size which the consumer is going to
+        #shrink the images down to anyway, if they're larger than this size.
+        #Hence, a JPEG can be decoded at a reduced size as long as it's still
+        #larger than this size
+        self._size_hint = size_hint
+        #when manifest is true, directories are scanned recursively for
+        #image files, and the scan is recorded on disk for the next run. The
+        #scan is recorded next to the directory, unless manifest is the path
+        #of the file to record it in
+        self._manifest = manifest
+        self._labels = None
+        self._signatures = None
+        #the archive which the images are read from, when the path is a zip
+        #file. It's opened once, and shared by all the worker threads
+        self._zip_path = None
+        self._archive = None
+        self._archive_lock = threading.Lock()
         self._data = self.load(self.path)
         self._image_indx = 0
+        #prefetch is the number of images which are decoded ahead of the
+        #consumer. Zero will keep the original behaviour of decoding each
+        #image on the calling thread
+        self._prefetch = self.__validate_prefetch(prefetch)
+        self._workers = workers
+        self._pool = None
+        #futures of the images which are currently been decoded, kept in the
+        #same order as the paths so the iteration order doesn't change
+        self._pending = deque()
+        self._submit_indx = 0
 
     #===========================ACCESORS========================================
     @property
@@ -42,26 +109,96 @@ class Image_Loader(object):
     def data(self):
         return self._data
 
+    @property
+    def prefetch(self):
+        return self._prefetch
+
+    @property
+    def signatures(self):
+        """
+        EXPORT: signatures (list)
+        PURPOSE: a signature for each loaded image which changes whenever the
+        image is changed. This is the size and the modification time of a
+        file, or the size and the CRC of a member of a zip file
+        """
+        if self._signatures is None:
+            self._signatures = [self.__file_signature(path)
+                    for path in self._data]
+        return self._signatures
+
+    @property
+    def size_hint(self):
+        return self._size_hint
+
+    @property
+    def cache(self):
+        return self._cache
+
+    @property
+    def labels(self):
+        """
+        EXPORT: labels (list)
+        PURPOSE: the label of each loaded image, which is the name of the
+        directory the image is in
+        """
+        if self._labels is None:
+            #images which are in memory aren't inside of a directory
+            self._labels = [os.path.basename(os.path.dirname(path))
+                    if isinstance(path, str) else None for path in self._data]
+        return self._labels
+
     @path.setter
     def path(self, nw_path):
         self._path = nw_path
         #self._path = self.__validate_path(nw_path)
         #re-loading the data at the new path
         self._data = self.load(self.path)
+        #any image which was been decoded belongs to the old path
+        self.__cancel_pending()
 
     #===========================SETTERS=========================================
     @mode.setter
     def mode(self, nw_mode):
         self._mode = self.__validate_mode(nw_mode)
+        #images which are been decoded were decoded in the old mode
+        self.__cancel_pending()
+
+    @prefetch.setter
+    def prefetch(self, nw_prefetch):
+        self._prefetch = self.__validate_prefetch(nw_prefetch)
+        self.__cancel_pending()
+
+    @size_hint.setter
+    def size_hint(self, nw_size_hint):
+        self._size_hint = nw_size_hint
+        self.__cancel_pending()
 
     #===========================PUBLIC METHODS==================================
     def load(self, path):
         """
-        IMPORT: path (string)
+        IMPORT: path (string, bytes of an encoded image, a file object, or None)
         EXPORT: res (list)
 
-        ASSERT: returns a list of image file[s]
+        ASSERT: returns a list of image file[s]. An image which is already in
+        memory, or which is read from a file object is kept as the bytes of
+        the encoded image, and it's decoded straight from those bytes
         """
+        self._labels = None
+        self._signatures = None
+        self.__close_archive()
+        self._zip_path = None
+        #a loader without a path is used for reading images from a stream
+        if path is None:
+            return []
+
+        if isinstance(path, (bytes, bytearray, memoryview)):
+            return [path]
+
+        if hasattr(path, 'read'):
+            return [path.read()]
+        if os.path.isfile(path) and path.lower().endswith(".zip"):
+            return self.load_zip(path)
+
         if os.path.isfile(path):
             #res has to be the same data type as the return of load_dir so I
             #can access the images the same way regardless if it's a file or
@@ -69,7 +206,10 @@ class Image_Loader(object):
             res = [path]
 
         if  os.path.isdir(path):
-            res = self.load_dir(path)
+            if self._manifest:
+                res = self.load_manifest(path)
+            else:
+                res = self.load_dir(path)
 
         return res
 
@@ -87,6 +227,45 @@ class Image_Loader(object):
 
         return paths
 
+    def load_manifest(self, path):
+        """
+        IMPORT: path (string)
+        EXPORT: paths (list)
+
+        PURPOSE: returns a list of the relitive paths of every image file
+        found recursively inside of a specified directory. The directory
+        listing is read from the manifest written next to the directory, and
+        only the directories which have changed are listed again
+        """
+        manifest_path = None if self._manifest is True else self._manifest
+        manifest = Manifest(path, manifest_path)
+        self._labels = manifest.labels
+        self._signatures = [entry[1:3] for entry in manifest.entries]
+
+        return manifest.paths
+
+    def load_zip(self, path):
+        """
+        IMPORT: path (string)
+        EXPORT: members (list)
+
+        PURPOSE: returns a list of the names of every image inside of a zip
+        file. The images are read straight out of the archive when they're
+        loaded, so the archive doesn't need to be extracted first
+        """
+        self._zip_path = path
+        infos = [info for info in self.__open_archive().infolist()
+                if not info.is_dir() and info.filename.lower().endswith(self.ext)]
+        members = [info.filename for info in infos]
+        #the CRC of a member changes whenever its contents change
+        self._signatures = [(info.file_size, info.CRC) for info in infos]
+        #the label of each image is the directory it's in, which is the same
+        #as the labels made from an extracted directory
+        self._labels = [posixpath.basename(posixpath.dirname(member))
+                for member in members]
+
+        return members
+
 
     def load_image(self, path):
         """
@@ -94,36 +273,183 @@ class Image_Loader(object):
         EXPORT: convert_img (numpy matrix)
 
         PURPPOSE: to load the image found in the specified path given the
-        specified mode to load the image in
-        """
-        convert_img = cv.imread(path)
-        if self._mode == 'GRAY':
-            convert_img = cv.cvtColor(convert_img,cv.COLOR_BGR2GRAY)
-        elif self._mode == 'HSV':
-            convert_img = cv.cvtColor(convert_img,cv.COLOR_BGR2HSV)
-        elif self._mode == 'LUV':
-            convert_img = cv.cvtColor(convert_img,cv.COLOR_BGR2Luv)
-        elif self._mode == 'LAB':
-            convert_img = cv.cvtColor(convert_img,cv.COLOR_BGR2Lab)
-        elif self._mode == "RGB":
-            convert_img = cv.cvtColor(convert_img,cv.COLOR_BGR2RGB)
+        specified mode to load the image in. If the loader has a cache, the
+        image is only decoded if it isn't already inside of the cache
+        """
+        #images which are in memory don't have a path, or a modification time
+        #to be cached by
+        if self._cache is None or not isinstance(path, str):
+            return self.__decode(path)
+
+        key = self.__cache_key(path)
+        convert_img = self._cache.get(key)
+        if convert_img is None:
+            convert_img = self.__decode(path)
+            self._cache.put(key, convert_img)
 
         return convert_img
 
+    def batches(self, size, shape):
+        """
+        IMPORT: size (integer): the number of images in each batch
+                shape (tuple of (width, height)): the size of each image
+        EXPORT: generator of (batch, paths, labels)
+                batch (numpy array of datatype uint8): the images stacked
+                along the first axis
+                paths (list): the path of each image in the batch
+                labels (list): the label of each image in the batch
+
+        PURPOSE: to load the images in fixed sized batches. Each image is
+        resized straight into a batch which has already been allocated, so
+        the batch is one contiguous block of memory. The last batch will have
+        less images if the number of images isn't a multiple of the size
+        """
+        if not isinstance(size, int) or size < 1:
+            raise ParameterError("batch size must be a positive integer: %s"
+                    % size)
+        width, height = shape
+        #a gray image will only have the one channel
+        channels = () if self._mode == 'GRAY' else (3,)
+        labels = self.labels
+
+        #iterating over this object, so the images are prefetched if the
+        #user has turned prefetching on
+        images = iter(self)
+        for start in range(0, len(self._data), size):
+            paths = self._data[start:start + size]
+            batch = np.empty((len(paths), height, width) + channels,
+                    dtype=np.uint8)
+            for ii in range(len(paths)):
+                cv.resize(next(images), (width, height), dst=batch[ii])
+
+            yield batch, paths, labels[start:start + size]
+
+    def stream(self, in_strm=None):
+        """
+        IMPORT: in_strm (binary file object), defualts to the standard input
+        EXPORT: generator of images (numpy arrays)
+
+        PURPOSE: to decode images from a stream, where each image is written
+        as its length (see frame_header) followed by the bytes of the encoded
+        image. Hence, images can be piped into the programme without been
+        written to the disk first. The generator finishes at the end of the
+        stream
+        """
+        if in_strm is None:
+            in_strm = sys.stdin.buffer
+
+        while True:
+            header = in_strm.read(self.frame_header.size)
+            if not header:
+                return
+            if len(header) < self.frame_header.size:
+                raise ImageError("stream ended part way through a header")
+
+            length = self.frame_header.unpack(header)[0]
+            buf = in_strm.read(length)
+            if len(buf) < length:
+                raise ImageError("stream ended part way through an image")
+
+            yield self.load_image(buf)
+
+    def write_frame(self, out_strm, buf):
+        """
+        IMPORT: out_strm (binary file object), buf (bytes of an encoded image)
+
+        PURPOSE: to write an image to a stream in the format which is read by
+        the stream method
+        """
+        out_strm.write(self.frame_header.pack(len(buf)))
+        out_strm.write(buf)
+
+    def decode_flag(self, path, flag=cv.IMREAD_COLOR):
+        """
+        IMPORT: path (string or bytes of an encoded image)
+                flag (integer): either IMREAD_COLOR or IMREAD_GRAYSCALE
+        EXPORT: flag (integer)
+
+        PURPOSE: to choose the smallest reduced decode mode which will still
+        give an image larger than the size hint. Hence, the consumer will
+        still shrink the image down to the same size as it would've done with
+        the full sized image
+        """
+        if self._size_hint is None:
+            return flag
+
+        #the extension isn't trusted, as some of the files in the data set
+        #are PNGs with a JPEG extension, and the other way around
+        size = self.read_size(path)
+        if size is None:
+            return flag
+
+        #sorting the dimensions, as OpenCV will rotate the image if the
+        #image has an EXIF orientation
+        small, large = sorted(size)
+        hint_small, hint_large = sorted(self._size_hint)
+        for factor, reduced_flag in self.reduced_flags[flag]:
+            if small // factor > hint_small and large // factor > hint_large:
+                return reduced_flag
+
+        return flag
+
+    def read_size(self, path):
+        """
+        IMPORT: path (string or bytes of an encoded image)
+        EXPORT: size (tuple of (width, height)) or None
+
+        PURPOSE: to read the size of a JPEG from its start of frame marker,
+        without decoding the image. None is returned if the file isn't a JPEG
+        or the marker couldn't be found
+        """
+        if isinstance(path, str):
+            inStrm = open(path, 'rb')
+        else:
+            inStrm = io.BytesIO(path)
+
+        with inStrm:
+            if inStrm.read(2) != b'\xff\xd8':
+                return None
+
+            while True:
+                byte = inStrm.read(1)
+                #skipping to the start of the next marker
+                while byte and byte != b'\xff':
+                    byte = inStrm.read(1)
+                #markers can be padded with any number of 0xff bytes
+                while byte == b'\xff':
+                    byte = inStrm.read(1)
+                if not byte:
+                    return None
+
+                marker = byte[0]
+                if marker in self.sof_markers:
+                    #skipping the length of the segment, and the precision
+                    inStrm.read(3)
+                    size_bytes = inStrm.read(4)
+                    if len(size_bytes) < 4:
+                        return None
+                    height, width = struct.unpack('>HH', size_bytes)
+                    return width, height
+
+                #these markers don't have a segment after them
+                if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+                    continue
+
+                length_bytes = inStrm.read(2)
+                if len(length_bytes) < 2:
+                    return None
+                length = struct.unpack('>H', length_bytes)[0]
+                inStrm.seek(length - 2, os.SEEK_CUR)
+
     def create_labels(self):
         """
         EXPORT: labels (list)
         PURPOSE: to create labels from the loaded directories. Hence, it
         will make the labels the same as the directory names
         """
-        labels = []
-        for path in self._data:
-            consititutes = path.split('/')
-            #the name of the directory is always going to be the last index
-            #of the splitted list
-            labels.append(consititutes[-1])
-
-        return labels
+        #the name of the directory is always going to be the last component
+        #of the path
+        return [os.path.basename(path) for path in self._data]
 
 
     def __iter__(self):
@@ -134,6 +460,13 @@ class Image_Loader(object):
         tries to iterate over this class
         """
         self._image_indx = 0
+        if self._prefetch > 0:
+            self.__cancel_pending()
+            self._submit_indx = 0
+            #filling up the window, so the workers can start decoding the
+            #images before the consumer asks for them
+            for ii in range(self._prefetch):
+                self.__submit_next()
         return self
 
     def __len__(self):
@@ -153,14 +486,149 @@ class Image_Loader(object):
         """
         if self._image_indx == len(self._data):
             raise StopIteration
-        curr_img_path = self._data[self._image_indx]
-        im = self.load_image(curr_img_path)
+
+        if self._prefetch > 0:
+            #the iterator can be advanced without calling iter() first, hence
+            #we need to make sure the window is pointing at the current image
+            if not self._pending:
+                self._submit_indx = self._image_indx
+                self.__submit_next()
+            future = self._pending.popleft()
+            #keeping the window full, whilst the consumer is using this image
+            self.__submit_next()
+            im = future.result()
+        else:
+            curr_img_path = self._data[self._image_indx]
+            im = self.load_image(curr_img_path)
 
         self._image_indx += 1
 
 
         return im
 
+    def close(self):
+        """
+        PURPOSE: to stop the worker threads which are used for prefetching,
+        and to close the archive if the images are read from a zip file. Both
+        will be opened again if the object is iterated over again
+        """
+        self.__cancel_pending()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        self.__close_archive()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __submit_next(self):
+        """
+        PURPOSE: to hand the next path which hasn't been decoded yet to the
+        pool of worker threads. OpenCV releases the GIL whilst it's decoding,
+        so the workers are able to run at the same time as the consumer
+        """
+        if self._submit_indx >= len(self._data):
+            return
+
+        if self._pool is None:
+            workers = self._workers
+            if workers is None:
+                workers = min(self._prefetch, os.cpu_count() or 1)
+            self._pool = ThreadPoolExecutor(max_workers=workers)
+
+        curr_img_path = self._data[self._submit_indx]
+        self._pending.append(self._pool.submit(self.load_image, curr_img_path))
+        self._submit_indx += 1
+
+    def __decode(self, path):
+        """
+        IMPORT: path (string)
+        EXPORT: convert_img (numpy matrix)
+
+        PURPOSE: to decode the image found in the specified path, straight
+        into the mode of the loader
+        """
+        #modes which aren't recognised are loaded as BGR, which is what OpenCV
+        #decodes to by defualt
+        flag, conversion = self.mode_table.get(self._mode,
+                self.mode_table['BGR'])
+        if not isinstance(path, str):
+            #the encoded image is already in memory
+            buf = np.frombuffer(path, np.uint8)
+            convert_img = cv.imdecode(buf, self.decode_flag(buf, flag))
+        elif self._zip_path is not None:
+            #the path is the name of a member inside of the archive
+            buf = np.frombuffer(self.__open_archive().read(path), np.uint8)
+            convert_img = cv.imdecode(buf, self.decode_flag(buf, flag))
+        else:
+            convert_img = cv.imread(path, self.decode_flag(path, flag))
+
+        if convert_img is None:
+            raise ImageError("image couldn't be decoded: %s" % (path
+                if isinstance(path, str) else "%d bytes" % len(path)))
+
+        if conversion is not None:
+            convert_img = cv.cvtColor(convert_img, conversion)
+
+        return convert_img
+
+    def __file_signature(self, path):
+        """
+        IMPORT: path (string or bytes of an encoded image)
+        EXPORT: signature (tuple) or None for images which are in memory
+        """
+        if not isinstance(path, str):
+            return None
+        stat = os.stat(path)
+        return (stat.st_size, stat.st_mtime_ns)
+
+    def __cache_key(self, path):
+        """
+        IMPORT: path (string)
+        EXPORT: key (tuple)
+
+        PURPOSE: to make the key of an image inside of the cache. The
+        modification time is a part of the key, so an image which has been
+        changed on the disk is decoded again
+        """
+        if self._zip_path is not None:
+            return (self._zip_path, path, os.stat(self._zip_path).st_mtime_ns,
+                    self._mode, self._size_hint)
+        return (path, os.stat(path).st_mtime_ns, self._mode, self._size_hint)
+
+    def __open_archive(self):
+        """
+        EXPORT: archive (ZipFile)
+
+        PURPOSE: to open the zip file the first time it's needed. The same
+        archive is shared by every thread, as ZipFile locks the underlying
+        file whilst a member is been read
+        """
+        with self._archive_lock:
+            if self._archive is None:
+                self._archive = zipfile.ZipFile(self._zip_path, 'r')
+            return self._archive
+
+    def __close_archive(self):
+        """
+        PURPOSE: to close the zip file if one is open
+        """
+        with self._archive_lock:
+            if self._archive is not None:
+                self._archive.close()
+                self._archive = None
+
+    def __cancel_pending(self):
+        """
+        PURPOSE: to throw away the images which were decoded ahead of the
+        consumer, as they no longer belong to this iteration
+        """
+        while self._pending:
+            self._pending.popleft().cancel()
+
     def __validate_path(self, nw_path):
         """
         IMPORT: nw_path (string)
@@ -188,6 +656,21 @@ class Image_Loader(object):
 
         return nw_path
 
+    def __validate_prefetch(self, nw_prefetch):
+        """
+        IMPORT: nw_prefetch (integer)
+        EXPORT: nw_prefetch (integer)
+        PURPOSE: to validate that the number of images to decode ahead of the
+        consumer is a non-negative integer
+        """
+        if not isinstance(nw_prefetch, int) or nw_prefetch < 0:
+            raise ParameterError("""
+            prefetch must be a non-negative integer:
+            input:
+            %s
+            """ % nw_prefetch)
+        return nw_prefetch
+
     def __validate_mode(self, nw_mode):
         """
         IMPORT: nw_mode (string)
@@ -0,0 +1,526 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE OF FILE: to define the nearest neighbour indexes which Trainer can
+search the trainning features with. Each index has the same interface as
+the kNN classifier of OpenCV (train, and find_nearest), so the indexes can be
+swapped to trade the accuracy of the search for the speed of the search as
+the trainning set grows
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+import cv2 as cv
+from Errors import *
+
+class Index(object):
+    """
+    The base class of the indexes. A sub-class only needs to define _train
+    and _search, the timing of the build and the queries, and the voting of
+    the neighbours is done by this class. Every index returns the squared L2
+    distances to the neighbours, which is what the kNN classifier of OpenCV
+    returns
+    """
+
+    name = None
+    backends = {}
+
+    def __init__(self, **params):
+        self._params = params
+        self._build_time = 0.0
+        self._query_time = 0.0
+        self._queries = 0
+
+    #===========================ACCESORS========================================
+    @property
+    def params(self):
+        return self._params
+
+    @property
+    def stats(self):
+        """
+        EXPORT: stats (dictionary)
+
+        PURPOSE: the time which it took to build the index, the mean time to
+        find the neighbours of one sample, and the number of bytes which the
+        index holds on to
+        """
+        return {
+            'backend': self.name,
+            'build_time': self._build_time,
+            'queries': self._queries,
+            'query_latency': self._query_time / self._queries
+                if self._queries else 0.0,
+            'memory': self.memory()
+        }
+
+    #===========================PUBLIC METHODS==================================
+    @classmethod
+    def register(cls, backend):
+        """
+        IMPORT: backend (sub-class of Index)
+        EXPORT: backend
+
+        PURPOSE: to add an index to the indexes which can be made by name
+        """
+        cls.backends[backend.name] = backend
+        return backend
+
+    @classmethod
+    def create(cls, name, **params):
+        """
+        IMPORT: name (string): one of the names inside of backends
+                params: the parameters of that index
+        EXPORT: index (Index)
+        """
+        if name not in cls.backends:
+            raise ParameterError("""
+            index backend of:
+            %s
+            the backend must be one of these:
+            %s
+            """ % (name, sorted(cls.backends)))
+        return cls.backends[name](**params)
+
+    def train(self, samples, labels):
+        """
+        IMPORT: samples (2D numpy array of float32), labels (1D numpy array)
+        EXPORT: True
+
+        PURPOSE: to build the index over the trainning samples
+        """
+        start = time.perf_counter()
+        self._labels = np.asarray(labels, dtype=np.float32).ravel()
+        self._train(samples, self._labels)
+        self._build_time = time.perf_counter() - start
+        return True
+
+    def find_nearest(self, samples, k):
+        """
+        IMPORT: samples (2D numpy array of float32), k (integer)
+        EXPORT: ret (float): the result of the first sample
+                results (numpy array (n, 1)): the voted label of each sample
+                neighbours (numpy array (n, k)): the labels of the neighbours
+                dists (numpy array (n, k)): the squared L2 distances
+
+        PURPOSE: to find the k nearest neighbours of each sample, and to vote
+        on the label of each sample. This returns the same as findNearest of
+        the kNN classifier of OpenCV
+        """
+        neighbours, dists = self.search(samples, k)
+        results = self.vote(neighbours)
+
+        ret = float(results[0, 0]) if len(results) else 0.0
+        return ret, results, neighbours, dists
+
+    def search(self, samples, k):
+        """
+        IMPORT: samples (2D numpy array of float32), k (integer)
+        EXPORT: neighbours (numpy array (n, k)): the labels of the neighbours
+                dists (numpy array (n, k)): the squared L2 distances
+
+        PURPOSE: to find the k nearest neighbours of each sample, sorted from
+        the closest to the furthest, without voting on them
+        """
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        start = time.perf_counter()
+        res = self._search(samples, k)
+        self._query_time += time.perf_counter() - start
+        self._queries += len(samples)
+        return res
+
+    def vote(self, neighbours):
+        """
+        IMPORT: neighbours (numpy array (n, k)): the labels of the neighbours
+        EXPORT: results (numpy array (n, 1))
+
+        PURPOSE: to pick the label which most of the neighbours have. A tie is
+        given to the smallest label, which is what the kNN classifier of
+        OpenCV does
+        """
+        neighbours = np.asarray(neighbours, dtype=np.float32)
+        if neighbours.size == 0:
+            return np.zeros((len(neighbours), 1), dtype=np.float32)
+
+        #np.unique sorts the labels, and argmax picks the first of the
+        #largest counts, hence a tie goes to the smallest label
+        classes = np.unique(neighbours)
+        counts = (neighbours[:, :, None] == classes).sum(axis=1)
+        results = classes[np.argmax(counts, axis=1)]
+        return results.reshape(-1, 1).astype(np.float32)
+
+    def margin(self, neighbours):
+        """
+        IMPORT: neighbours (numpy array (n, k)): the labels of the neighbours
+        EXPORT: margins (numpy array (n,))
+
+        PURPOSE: how much the vote was won by i.e. the share of the neighbours
+        which voted for the winning label, less the share which voted for the
+        runner up. A margin of 1 means every neighbour has the same label
+        """
+        neighbours = np.asarray(neighbours, dtype=np.float32)
+        if neighbours.size == 0:
+            return np.zeros(len(neighbours), dtype=np.float32)
+
+        classes = np.unique(neighbours)
+        counts = (neighbours[:, :, None] == classes).sum(axis=1)
+        counts.sort(axis=1)
+        runner_up = counts[:, -2] if counts.shape[1] > 1 else 0
+        return ((counts[:, -1] - runner_up) / neighbours.shape[1]).astype(
+                np.float32)
+
+    def memory(self):
+        """
+        EXPORT: the number of bytes which the index holds on to
+        """
+        return 0
+
+    def close(self):
+        """
+        PURPOSE: to release anything which the index holds on to outside of
+        this process
+        """
+        pass
+
+
+@Index.register
+class Brute_Index(Index):
+    """
+    An exact search which compares every sample against every trainning
+    sample, using the kNN classifier of OpenCV. The kNN classifier only
+    accepts float32 samples, hence compact samples (uint8 or float16) are
+    kept as they are, and are only widened to float32 a chunk of rows at a
+    time while the distances are computed
+    """
+
+    name = 'brute'
+    #the number of trainning rows which are widened to float32 at a time
+    chunk_rows = 4096
+
+    def _train(self, samples, labels):
+        if samples.dtype != np.float32:
+            self._knn = None
+            #keeping the samples as they are, which may be a memory map
+            self._samples = samples
+            self._norms = _norms(samples, 0, len(samples), self.chunk_rows)
+            self._nbytes = samples.nbytes + self._norms.nbytes + labels.nbytes
+            return
+
+        self._knn = cv.ml.KNearest_create()
+        self._knn.train(np.ascontiguousarray(samples, dtype=np.float32),
+                cv.ml.ROW_SAMPLE, labels)
+        self._nbytes = samples.shape[0] * samples.shape[1] * 4 + labels.nbytes
+
+    def find_nearest(self, samples, k):
+        if self._knn is None:
+            return super().find_nearest(samples, k)
+
+        #the kNN classifier votes by itself, so it's only timed here
+        samples = np.ascontiguousarray(samples, dtype=np.float32)
+        start = time.perf_counter()
+        res = self._knn.findNearest(samples, k)
+        self._query_time += time.perf_counter() - start
+        self._queries += len(samples)
+        return res
+
+    def _search(self, samples, k):
+        if self._knn is not None:
+            ret, results, neighbours, dists = self._knn.findNearest(samples, k)
+            return neighbours, dists
+
+        dists, idxs = _top_k(self._samples, samples, k, 0, len(self._samples),
+                self.chunk_rows, self._norms)
+        return self._labels[idxs], dists
+
+    def memory(self):
+        #the kNN classifier keeps its own copy of the trainning samples
+        return self._nbytes
+
+
+@Index.register
+class Tree_Index(Index):
+    """
+    A search over randomised kd-trees, using the FLANN library which is a
+    part of OpenCV. Searching more leaves (checks) gives a more accurate
+    search, which takes longer
+    """
+
+    name = 'kdtree'
+    #the value of the FLANN_INDEX_KDTREE algorithm
+    algorithm = 1
+
+    def _train(self, samples, labels):
+        #keeping a reference, as FLANN doesn't always copy the samples
+        self._samples = np.ascontiguousarray(samples, dtype=np.float32)
+        self._flann = cv.flann_Index(self._samples, {
+            'algorithm': self.algorithm,
+            'trees': self._params.get('trees', 4)
+        })
+
+    def _search(self, samples, k):
+        k = min(k, len(self._samples))
+        idxs, dists = self._flann.knnSearch(samples, k,
+                params={'checks': self._params.get('checks', 64)})
+        return self._labels[idxs], dists.astype(np.float32)
+
+    def memory(self):
+        #the trees hold an index for each sample in each tree
+        trees = self._params.get('trees', 4)
+        return self._samples.nbytes + trees * len(self._samples) * 4
+
+
+@Index.register
+class LSH_Index(Index):
+    """
+    An approximate search using locality-sensitive hashing with random
+    hyperplanes. Each table hashes a sample by which side of each of its
+    planes the sample is on, and only the trainning samples which share a
+    bucket with the query are compared against the query. More tables, less
+    bits in each hash, and probing the neighbouring buckets (probes) all give
+    a higher recall, for a slower search
+    """
+
+    name = 'lsh'
+
+    def _train(self, samples, labels):
+        self._samples = np.ascontiguousarray(samples, dtype=np.float32)
+        tables = self._params.get('tables', 8)
+        bits = self._params.get('bits', 12)
+        rng = np.random.default_rng(self._params.get('seed', 0))
+
+        #centring the planes on the data, so the planes split the data
+        #instead of all of the samples being on one side of the plane
+        self._mean = self._samples.mean(axis=0)
+        self._planes = rng.standard_normal((tables, self._samples.shape[1],
+            bits)).astype(np.float32)
+        self._powers = 1 << np.arange(bits, dtype=np.int64)
+        self._norms = np.einsum('ij,ij->i', self._samples, self._samples)
+
+        self._buckets = []
+        for table in range(tables):
+            codes = self.__hash(self._samples, table)[0]
+            order = np.argsort(codes, kind='stable')
+            keys, starts = np.unique(codes[order], return_index=True)
+            groups = np.split(order, starts[1:])
+            self._buckets.append(dict(zip(keys.tolist(), groups)))
+
+    def _search(self, samples, k):
+        k = min(k, len(self._samples))
+        probes = self._params.get('probes', 0)
+        neighbours = np.zeros((len(samples), k), dtype=np.float32)
+        dists = np.zeros((len(samples), k), dtype=np.float32)
+
+        hashes = [self.__hash(samples, table) for table in
+                range(len(self._buckets))]
+        for ii, sample in enumerate(samples):
+            candidates = []
+            for table, buckets in enumerate(self._buckets):
+                codes, projections = hashes[table]
+                code = int(codes[ii])
+                for probe in self.__probe_codes(code, projections[ii], probes):
+                    bucket = buckets.get(probe)
+                    if bucket is not None:
+                        candidates.append(bucket)
+
+            candidates = np.unique(np.concatenate(candidates)) if candidates \
+                    else np.zeros(0, dtype=np.int64)
+            #not enough samples share a bucket with this sample, hence the
+            #whole trainning set is searched
+            if len(candidates) < k:
+                candidates = np.arange(len(self._samples))
+
+            cand_dists = self._norms[candidates] - 2 * \
+                    (self._samples[candidates] @ sample) + sample @ sample
+            nearest = np.argpartition(cand_dists, k - 1)[:k]
+            nearest = nearest[np.argsort(cand_dists[nearest], kind='stable')]
+            neighbours[ii] = self._labels[candidates[nearest]]
+            dists[ii] = np.maximum(cand_dists[nearest], 0)
+
+        return neighbours, dists
+
+    def memory(self):
+        indexes = sum(len(bucket) for buckets in self._buckets
+                for bucket in buckets.values()) * 8
+        return self._samples.nbytes + self._planes.nbytes + indexes
+
+    #===========================PRIVATE METHODS=================================
+    def __hash(self, samples, table):
+        """
+        IMPORT: samples (2D numpy array), table (integer)
+        EXPORT: codes (numpy array of int64), projections (2D numpy array)
+        """
+        projections = (samples - self._mean) @ self._planes[table]
+        codes = (projections > 0).astype(np.int64) @ self._powers
+        return codes, projections
+
+    def __probe_codes(self, code, projections, probes):
+        """
+        IMPORT: code (integer), projections (numpy array), probes (integer)
+        EXPORT: list of codes
+
+        PURPOSE: the bucket of the sample, and the buckets found by flipping
+        the bits of the planes which the sample is closest to
+        """
+        codes = [code]
+        if probes > 0:
+            closest = np.argsort(np.abs(projections))[:probes]
+            codes.extend(code ^ int(self._powers[bit]) for bit in closest)
+        return codes
+
+
+@Index.register
+class Shard_Index(Index):
+    """
+    An exact search which splits the trainning samples into a shard for each
+    worker process. The samples are written once to a file of the index,
+    which each worker maps and only reads the rows of its own shard from, so
+    the pages of the file are shared between the workers rather than copied.
+    The file belongs to the index, hence a feature store which is made again
+    or updated after the index was trainned doesn't change what the workers
+    read. Each worker finds the k nearest neighbours inside of its shard, and
+    the closest k of all of the shards are kept
+    """
+
+    name = 'sharded'
+    chunk_rows = 4096
+
+    def _train(self, samples, labels):
+        self._workers = self._params.get('workers', os.cpu_count() or 1)
+        #the workers only map the samples when they're first searched, hence
+        #the file of a feature store could have been replaced by then
+        self._tmp_dir = tempfile.mkdtemp(prefix='kNN_shards')
+        file_name = os.path.join(self._tmp_dir, 'samples.bin')
+        np.ascontiguousarray(samples).tofile(file_name)
+        self._file = (file_name, 0)
+        self._dtype = samples.dtype.str
+        self._shape = samples.shape
+
+        #a shard for each worker, which are all about the same size
+        shards = max(1, min(self._workers, len(samples)))
+        bounds = np.linspace(0, len(samples), shards + 1).astype(int)
+        self._shards = list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+        #spawning, as forking a process which has threads running can leave
+        #the locks of the child process held forever
+        self._pool = ProcessPoolExecutor(max_workers=len(self._shards),
+                mp_context=multiprocessing.get_context('spawn'))
+
+    def _search(self, samples, k):
+        k = min(k, self._shape[0])
+        futures = [self._pool.submit(_search_shard, self._file, self._dtype,
+            self._shape, start, end, samples, k, self.chunk_rows)
+            for start, end in self._shards]
+
+        #merging the closest k of each shard into the closest k of them all
+        shard_res = [future.result() for future in futures]
+        dists = np.concatenate([res[0] for res in shard_res], axis=1)
+        idxs = np.concatenate([res[1] for res in shard_res], axis=1)
+        nearest = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        dists = np.take_along_axis(dists, nearest, axis=1)
+        idxs = np.take_along_axis(idxs, nearest, axis=1)
+        order = np.argsort(dists, axis=1, kind='stable')
+        dists = np.take_along_axis(dists, order, axis=1)
+        idxs = np.take_along_axis(idxs, order, axis=1)
+        return self._labels[idxs], dists
+
+    def memory(self):
+        #the samples are only held once, by the page cache, and are shared
+        #between all of the workers
+        return int(np.prod(self._shape)) * np.dtype(self._dtype).itemsize + \
+                self._labels.nbytes
+
+    def close(self):
+        self._pool.shutdown(cancel_futures=True)
+        if self._tmp_dir is not None:
+            shutil.rmtree(self._tmp_dir, ignore_errors=True)
+            self._tmp_dir = None
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+#the memory maps, and the norms of the shards which have been opened by a
+#worker process, so each worker only opens its shard once
+_shard_cache = {}
+
+def _search_shard(file_info, dtype, shape, start, end, queries, k,
+        chunk_rows):
+    """
+    IMPORT: file_info (tuple): (file name, offset) of the trainning samples
+            dtype (string), shape (tuple): of the trainning samples
+            start, end (integers): the rows of the shard
+            queries (2D numpy array of float32), k (integer)
+            chunk_rows (integer)
+    EXPORT: dists (numpy array (n, k)), idxs (numpy array (n, k))
+
+    PURPOSE: to find the k nearest neighbours inside of one shard. This is a
+    function of the module, so it can be sent to a worker process
+    """
+    key = (file_info, dtype, tuple(shape), start, end)
+    if key not in _shard_cache:
+        samples = np.memmap(file_info[0], dtype=dtype, mode='r',
+                offset=file_info[1], shape=tuple(shape))
+        _shard_cache[key] = (samples, _norms(samples, start, end, chunk_rows))
+    samples, norms = _shard_cache[key]
+    return _top_k(samples, queries, k, start, end, chunk_rows, norms)
+
+def _norms(samples, start, end, chunk_rows):
+    """
+    IMPORT: samples (2D numpy array), start, end, chunk_rows (integers)
+    EXPORT: the squared L2 norm of each row from start to end
+
+    PURPOSE: to compute the norms a chunk of rows at a time, so only a chunk
+    of the samples is widened to float32 at once
+    """
+    norms = np.zeros(end - start, dtype=np.float32)
+    for first in range(start, end, chunk_rows):
+        last = min(first + chunk_rows, end)
+        chunk = np.asarray(samples[first:last], dtype=np.float32)
+        norms[first - start:last - start] = np.einsum('ij,ij->i', chunk,
+                chunk)
+    return norms
+
+def _top_k(samples, queries, k, start, end, chunk_rows, norms):
+    """
+    IMPORT: samples (2D numpy array): the trainning samples, of any type
+            queries (2D numpy array of float32), k (integer)
+            start, end (integers): the rows of the samples which are searched
+            chunk_rows (integer)
+            norms (numpy array): the squared L2 norm of each sample from
+            start to end
+    EXPORT: dists (numpy array (n, k)): the squared L2 distances, sorted
+            idxs (numpy array (n, k)): the row of each neighbour
+
+    PURPOSE: to find the k closest samples to each query, widening a chunk
+    of the samples to float32 at a time, and keeping the closest k of the
+    best so far, and of each chunk
+    """
+    k = min(k, end - start)
+    query_norms = np.einsum('ij,ij->i', queries, queries)
+    best_dists = np.zeros((len(queries), 0), dtype=np.float32)
+    best_idxs = np.zeros((len(queries), 0), dtype=np.int64)
+    for first in range(start, end, chunk_rows):
+        last = min(first + chunk_rows, end)
+        chunk = np.asarray(samples[first:last], dtype=np.float32)
+        dists = norms[first - start:last - start] - 2 * (queries @ chunk.T) + \
+                query_norms[:, None]
+        idxs = np.broadcast_to(np.arange(first, last), dists.shape)
+
+        dists = np.concatenate((best_dists, dists), axis=1)
+        idxs = np.concatenate((best_idxs, idxs), axis=1)
+        nearest = np.argpartition(dists, k - 1, axis=1)[:, :k]
+        best_dists = np.take_along_axis(dists, nearest, axis=1)
+        best_idxs = np.take_along_axis(idxs, nearest, axis=1)
+
+    order = np.argsort(best_dists, axis=1, kind='stable')
+    best_dists = np.take_along_axis(best_dists, order, axis=1)
+    best_idxs = np.take_along_axis(best_idxs, order, axis=1)
+    return np.maximum(best_dists, 0), best_idxs
@@ -0,0 +1,233 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE OF FILE: to keep a record of every image file inside of a data set
+directory, so the directory tree doesn't have to be listed again every time
+the data set is loaded. The record (the manifest) is written next to the
+data set, and on later runs only the directories which have changed since
+the manifest was written are listed again. The files of the other
+directories are only stat-ed again
+"""
+
+import os
+import json
+from Errors import *
+
+class Manifest(object):
+    """
+    The manifest stores each directory of the data set with its modification
+    time, the sub-directories inside of it, and the image files inside of it
+    with their size and modification time. Adding, removing or renaming a file
+    changes the modification time of the directory it's in. Hence, a
+    directory which has the same modification time as the one which was
+    recorded doesn't need to be listed again. Changing a file in place
+    doesn't change the modification time of its directory, hence the files
+    of those directories are still stat-ed on every scan
+
+    The label of each image is the directory which it's in, hence the images
+    directly inside of the root of the data set don't have a label, and
+    they're left out
+    """
+
+    ext = (".png", ".jpg", ".jpeg")
+    version = 1
+    suffix = ".manifest"
+
+    def __init__(self, root, manifest_path=None):
+        self._root = self.__validate_root(root)
+        if manifest_path is None:
+            #placing the manifest next to the data set rather than inside of
+            #it, so writing the manifest won't change the modification time
+            #of the data set directory
+            manifest_path = os.path.normpath(root) + self.suffix
+        self._manifest_path = manifest_path
+        self._dirs = {}
+        self.scan()
+
+    #===========================ACCESORS========================================
+    @property
+    def root(self):
+        return self._root
+
+    @property
+    def manifest_path(self):
+        return self._manifest_path
+
+    @property
+    def entries(self):
+        """
+        EXPORT: list of (path, size, mtime, label) tuples for every image in
+        the data set
+        """
+        return self._entries
+
+    @property
+    def paths(self):
+        return [entry[0] for entry in self._entries]
+
+    @property
+    def labels(self):
+        return [entry[3] for entry in self._entries]
+
+    #===========================PUBLIC METHODS==================================
+    def scan(self):
+        """
+        EXPORT: entries (list)
+
+        PURPOSE: to walk through the data set, only listing the directories
+        which have changed since the manifest was last written, and to write
+        the manifest again if anything has changed
+        """
+        old_dirs = self.__read()
+        nw_dirs = {}
+        changed = False
+
+        #walking the tree with a stack of relative paths, so the relative
+        #paths can be used as the keys inside of the manifest
+        stack = ['.']
+        while stack:
+            rel_dir = stack.pop()
+            abs_dir = os.path.join(self._root, rel_dir)
+            try:
+                mtime = os.stat(abs_dir).st_mtime_ns
+            except FileNotFoundError:
+                changed = True
+                continue
+
+            record = old_dirs.get(rel_dir)
+            if record is None or record['mtime'] != mtime:
+                record = self.__list_dir(abs_dir, mtime)
+                changed = True
+            else:
+                changed = self.__restat_files(abs_dir, record) or changed
+
+            nw_dirs[rel_dir] = record
+            for sub_dir in record['dirs']:
+                stack.append(os.path.normpath(os.path.join(rel_dir, sub_dir)))
+
+        #directories which were removed won't be visited again
+        if set(old_dirs) != set(nw_dirs):
+            changed = True
+
+        self._dirs = nw_dirs
+        self._entries = self.__make_entries()
+
+        if changed:
+            self.__write()
+
+        return self._entries
+
+    #===========================PRIVATE METHODS=================================
+    def __list_dir(self, abs_dir, mtime):
+        """
+        IMPORT: abs_dir (string), mtime (integer)
+        EXPORT: record (dictionary)
+
+        PURPOSE: to list a single directory, storing the sub-directories and
+        the image files found inside of it
+        """
+        dirs = []
+        files = []
+        with os.scandir(abs_dir) as it:
+            for entry in it:
+                if entry.is_dir():
+                    dirs.append(entry.name)
+                elif entry.name.lower().endswith(self.ext):
+                    stat = entry.stat()
+                    files.append([entry.name, stat.st_size, stat.st_mtime_ns])
+
+        #sorting, so the order of the images doesn't depend on the file system
+        dirs.sort()
+        files.sort()
+        return {'mtime': mtime, 'dirs': dirs, 'files': files}
+
+    def __restat_files(self, abs_dir, record):
+        """
+        IMPORT: abs_dir (string), record (dictionary)
+        EXPORT: changed (boolean)
+
+        PURPOSE: to update the size, and modification time of every file in
+        a directory which hasn't been listed again
+        """
+        changed = False
+        for entry in record['files']:
+            stat = os.stat(os.path.join(abs_dir, entry[0]))
+            if entry[1:] != [stat.st_size, stat.st_mtime_ns]:
+                entry[1:] = [stat.st_size, stat.st_mtime_ns]
+                changed = True
+        return changed
+
+    def __make_entries(self):
+        """
+        EXPORT: entries (list)
+
+        PURPOSE: to create the flat list of images from the directory records.
+        The label of each image is the name of the directory which it's in
+        """
+        entries = []
+        for rel_dir in sorted(self._dirs):
+            #the images in the root of the data set aren't in a label
+            #directory
+            if rel_dir == '.':
+                continue
+            record = self._dirs[rel_dir]
+            base = os.path.join(self._root, rel_dir)
+            label = os.path.basename(rel_dir)
+
+            for name, size, mtime in record['files']:
+                entries.append((os.path.join(base, name), size, mtime, label))
+
+        return entries
+
+    def __read(self):
+        """
+        EXPORT: dirs (dictionary)
+
+        PURPOSE: to read the directory records of a previous scan. An empty
+        dictionary is returned if the manifest doesn't exist or if it was
+        written by a different version of this class
+        """
+        try:
+            with open(self._manifest_path, 'r') as inStrm:
+                manifest = json.load(inStrm)
+        except (OSError, ValueError):
+            return {}
+
+        if manifest.get('version') != self.version:
+            return {}
+
+        return manifest.get('dirs', {})
+
+    def __write(self):
+        """
+        PURPOSE: to write the manifest next to the data set. The manifest is
+        written to a temporary file first, so a crash half way through won't
+        leave a broken manifest behind
+        """
+        manifest = {
+            'version': self.version,
+            'dirs': self._dirs,
+            'images': self._entries
+        }
+        tmp_path = self._manifest_path + '.tmp'
+        try:
+            with open(tmp_path, 'w') as outStrm:
+                json.dump(manifest, outStrm)
+            os.replace(tmp_path, self._manifest_path)
+        except OSError:
+            #a read only data set can still be used, it will just be
+            #listed again on the next run
+            pass
+
+    def __validate_root(self, root):
+        """
+        IMPORT: root (string)
+        EXPORT: root (string)
+
+        PURPOSE: to validate that the root of the data set is a directory
+        """
+        if not isinstance(root, str) or not os.path.isdir(root):
+            raise PathError("data set is not a valid directory: %s" % root)
+
+        return root
@@ -0,0 +1,163 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE OF FILE: to project the trainning features, and the features of the
+digits which are classified down to a small number of dimensions before the
+nearest neighbours are searched. Hence, the index holds a much smaller
+trainning matrix, and each distance is computed over far less values
+"""
+
+import os
+import io
+import json
+import numpy as np
+import cv2 as cv
+from Errors import *
+
+class Projection(object):
+    """
+    A projection is either:
+        pca : the principal components of the trainning features, which
+              keep as much of the variance of the features as possible
+        random : a seeded gaussian random matrix, which roughly keeps the
+                 distances between the features, and is much faster to fit
+
+    The projection is saved next to the feature store, with the fingerprint
+    of the store which it was fitted on. Hence, it's only fitted again when
+    the trainning features change
+    """
+
+    methods = ("pca", "random")
+    file_name = "projection.npz"
+
+    def __init__(self, method="pca", components=64, seed=0):
+        self._method = self.__validate_method(method)
+        self._components = self.__validate_components(components)
+        self._seed = seed
+        self._mean = None
+        self._basis = None
+        self._key = None
+
+    #===========================ACCESORS========================================
+    @property
+    def method(self):
+        return self._method
+
+    @property
+    def components(self):
+        return self._components
+
+    @property
+    def params(self):
+        """
+        EXPORT: params (dictionary): what decides how the projection is fitted
+        """
+        return {'method': self._method, 'components': self._components,
+                'seed': self._seed}
+
+    @property
+    def key(self):
+        return self._key
+
+    @property
+    def fitted(self):
+        return self._basis is not None
+
+    #===========================PUBLIC METHODS==================================
+    def fit(self, features, key=None):
+        """
+        IMPORT: features (2D numpy array), key (string): the fingerprint of
+                the features which the projection is fitted on
+        EXPORT: self
+
+        PURPOSE: to find the mean, and the basis which the features are
+        projected onto
+        """
+        features = np.asarray(features, dtype=np.float32)
+        length = features.shape[1]
+        self._mean = features.mean(axis=0, keepdims=True)
+
+        if self._method == 'pca':
+            #they can't be more principal components than samples
+            components = min(self._components, features.shape[0], length)
+            mean, basis = cv.PCACompute(features, self._mean,
+                    maxComponents=components)
+        else:
+            rng = np.random.default_rng(self._seed)
+            #scaling, so the projected distances are about the same size as
+            #the distances between the original features
+            basis = rng.standard_normal((self._components, length)) / \
+                    np.sqrt(self._components)
+
+        self._basis = np.ascontiguousarray(basis, dtype=np.float32)
+        self._key = key
+        return self
+
+    def transform(self, features):
+        """
+        IMPORT: features (2D numpy array)
+        EXPORT: projected (2D numpy array of float32)
+        """
+        if not self.fitted:
+            raise ParameterError("projection has to be fitted before it's used")
+        features = np.asarray(features, dtype=np.float32)
+        return np.ascontiguousarray((features - self._mean) @ self._basis.T)
+
+    def save(self, directory):
+        """
+        IMPORT: directory (string): the directory of the feature store
+
+        PURPOSE: to write the projection next to the trainning features. A
+        temporary file is written first, so a reader won't see half of it
+        """
+        file_name = os.path.join(directory, self.file_name)
+        buf = io.BytesIO()
+        np.savez(buf, mean=self._mean, basis=self._basis,
+                params=json.dumps(self.params), key=json.dumps(self._key))
+        with open(file_name + '.tmp', 'wb') as outStrm:
+            outStrm.write(buf.getvalue())
+        os.replace(file_name + '.tmp', file_name)
+
+    def load(self, directory, key=None):
+        """
+        IMPORT: directory (string), key (string)
+        EXPORT: True if the saved projection was loaded
+
+        PURPOSE: to load the projection saved in directory, as long as it was
+        fitted with the same parameters on the features with the same key
+        """
+        file_name = os.path.join(directory, self.file_name)
+        try:
+            with np.load(file_name) as saved:
+                params = json.loads(str(saved['params']))
+                saved_key = json.loads(str(saved['key']))
+                mean = saved['mean']
+                basis = saved['basis']
+        except (OSError, ValueError, KeyError):
+            return False
+
+        if params != self.params or saved_key != key:
+            return False
+
+        self._mean = mean
+        self._basis = basis
+        self._key = saved_key
+        return True
+
+    #===========================PRIVATE METHODS=================================
+    def __validate_method(self, method):
+        if method not in self.methods:
+            raise ParameterError("""
+            projection method of:
+            %s
+            the method must be one of these:
+            %s
+            """ % (method, self.methods))
+        return method
+
+    def __validate_components(self, components):
+        if not isinstance(components, int) or components <= 0:
+            raise ParameterError("number of components must be a positive"+
+                    " integer: %s" % components)
+        return components
@@ -10,7 +10,18 @@ kNN for trainning and classification of its data
 from Image import *
 from ImageLoader import *
 from Colours import *
+from FeatureStore import *
+from Manifest import *
+from Index import *
+from Projection import *
+from Features import *
+from Augmenter import *
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+import hashlib
+import threading
+import multiprocessing
+import json
 import pickle
 
 #This class is meant to be an abstract class but, #I have choosen to make this
@@ -19,13 +30,95 @@ import pickle
 #trainning method
 
 class Trainer(object):
+    #the version of the way the trainning features are made. This has to be
+    #changed whenever a change to the code changes the trainning features,
+    #so any feature store made by the older code is made again
+    feature_version = 3
+    #the size (width, height) which every digit is resized to
+    digit_size = (28, 40)
+    #the mean, and the standard deviation of the noise added to each
+    #trainning image
+    noise_mean = (25, 25, 25)
+    noise_sigma = (200, 200, 200)
+    #the most number of images which a worker will process in one task
+    chunk_size = 256
+    #the data type which the trainning features can be stored as, and the
+    #largest value which is stored in it (None keeps the features as they
+    #are). float16 is normalised to between 0 and 1, so the squared
+    #distances can't overflow when they're widened
+    storage_types = {
+        'float32': (np.float32, None),
+        'float16': (np.float16, 1.0),
+        'uint8': (np.uint8, 255.0)
+    }
+
+    #when the kNN model is trainned: straight away (eager), on the first
+    #classification (lazy), or by a thread whilst the caller does something
+    #else (background)
+    loads = ('eager', 'lazy', 'background')
+
+    #a lock for each feature store used by this process, so two trainners
+    #of the same store (i.e. the stages of a Cascade) don't make the store
+    #at the same time. The second one reads the store made by the first one
+    _store_locks = {}
+    _store_locks_guard = threading.Lock()
+
     def __init__(self, **kwargs):
         self._mode = kwargs['mode']
         self._train_path = kwargs['train_path']
         #I am going to use the validation path as the same as the
         #test path for this data as they're doing the same thing
         self._val_path = kwargs['val_path']
-        self._trainner = self.train()
+        #the directory where the trainning features are stored, so they don't
+        #have to be made again on the next run
+        self._store_path = kwargs.get('store_path', 'kNN_store')
+        #the number of processes which build the trainning features, one
+        #process will build the features without a process pool
+        self._workers = kwargs.get('workers', os.cpu_count() or 1)
+        #the file which the listing of the trainning directory is kept in,
+        #None keeps it next to the trainning directory (see Manifest.py)
+        self._manifest_path = kwargs.get('manifest_path')
+        #the data type which the trainning features are stored in, on the
+        #disk and in the memory of the index
+        self._storage = self.__validate_storage(kwargs.get('storage',
+            'float32'))
+        #what the features of each digit are made out of i.e. the raw
+        #'pixels' of the digit, or the 'hog' of the digit (see Features.py)
+        self._features = kwargs.get('features', 'pixels')
+        #thresholding each grayscale digit into a white digit on a black
+        #background, before its features are made
+        self._binarise = self.__validate_binarise(kwargs.get('binarise',
+            False))
+        #the noise added to the trainning images is drawn from a generator
+        #seeded by seed, and each image can be augmented into several copies
+        self._augmenter = Augmenter(self.noise_mean, self.noise_sigma,
+                kwargs.get('copies', 1), kwargs.get('seed', 0))
+        self._extractor = Feature_Extractor.create(self._features, self._mode,
+                self.digit_size)
+        #the nearest neighbour index which the trainning features are
+        #searched with, and its parameters (see Index.py)
+        self._index = kwargs.get('index', 'brute')
+        self._index_params = kwargs.get('index_params', {})
+        #an optional projection ('pca' or 'random') of the features down to
+        #a number of components, before the nearest neighbours are searched
+        self._projection = None
+        if kwargs.get('projection') is not None:
+            self._projection = Projection(kwargs['projection'],
+                    kwargs.get('components', 64))
+
+        self._trainner = None
+        self._train_error = None
+        self._train_lock = threading.Lock()
+        self._train_thread = None
+        self._load = self.__validate_load(kwargs.get('load', 'eager'))
+        if self._load == 'eager':
+            self._trainner = self.train()
+        elif self._load == 'background':
+            #a daemon thread, so a programme which exits early isn't kept
+            #waiting for the model
+            self._train_thread = threading.Thread(target=self.__train_thread,
+                    daemon=True)
+            self._train_thread.start()
 
     #===========================ACCESORS========================================
     @property
@@ -42,10 +135,59 @@ class Trainer(object):
 
     @property
     def trainner(self):
+        """
+        EXPORT: index (Index): the trainned kNN model
+
+        PURPOSE: to get the kNN model, waiting for the background thread to
+        train it, or trainning it now if it hasn't been trainned yet
+        """
+        if self._trainner is None:
+            self.wait()
         return self._trainner
 
+    @property
+    def ready(self):
+        """
+        EXPORT: True if the kNN model has been trainned
+        """
+        return self._trainner is not None
+
+    @property
+    def augmenter(self):
+        return self._augmenter
+
+    @property
+    def extractor(self):
+        return self._extractor
+
+    @property
+    def projection(self):
+        return self._projection
+
+    @property
+    def index_stats(self):
+        """
+        EXPORT: stats (dictionary): the build time, query latency and memory
+        of the nearest neighbour index
+        """
+        return self.trainner.stats
 
     #===========================PUBLIC METHODS==================================
+    def wait(self):
+        """
+        PURPOSE: to block until the kNN model has been trainned. An exception
+        raised by the background thread is raised again here
+        """
+        if self._train_thread is not None:
+            self._train_thread.join()
+        if self._train_error is not None:
+            raise self._train_error
+
+        #only one caller trains a lazy model
+        with self._train_lock:
+            if self._trainner is None:
+                self._trainner = self.train()
+
     def train(self):
         """
         import:None
@@ -59,62 +201,147 @@ class Trainer(object):
             with python 4 Tutorial 36. https://www.youtube.com/watch?v=tOVwVvRy
             _Pg&ab_channel=Pysource
         """
-        trainning_file_name = "kNN_classfier"
-        labels_file_name = "kNN_labels"
+        #the serilised files made by older versions of this programme, which
+        #are looked for in the same directory as the feature store
+        store_dir = os.path.dirname(self._store_path)
+        trainning_file_name = os.path.join(store_dir, "kNN_classfier")
+        labels_file_name = os.path.join(store_dir, "kNN_labels")
+        store = Feature_Store(self._store_path)
 
-        #checking if a trainning file already exists in the current directory
-        #if it does, load that file
+        #another trainner of the same store may be making it
+        with self.__store_lock():
+            if not os.path.exists(self._train_path):
+                #they're no trainning images to check the feature store
+                #against, hence the store, or the old serilised files are
+                #used as they are
+                if store.exists():
+                    print(green+"reading in feature store...."+reset)
+                    self.__validate_store(store.metadata.get('params'),
+                            store.path)
+                    trainning_data, labels_data = store.open()
+                    self.__validate_length(trainning_data, store.path)
+                elif os.path.isfile(trainning_file_name) and \
+                os.path.isfile(labels_file_name):
+                    print(green+"reading in serilised file...."+reset)
+                    #the serilised files only hold the float32 pixels of
+                    #BGR digits, without a projection
+                    self.__validate_store(self.__params(mode='BGR',
+                        storage='float32', features='pixels', binarise=False),
+                        trainning_file_name)
+                    if self._projection is not None:
+                        raise StoreError("the serilised file can't be used "+
+                                "with a projection: %s" % trainning_file_name)
+                    with open(trainning_file_name, 'rb') as inStrm:
+                        trainning_data = pickle.load(inStrm)
 
-        if trainning_file_name in os.listdir() and \
-        labels_file_name in os.listdir()  :
-            print(green+"reading in serilised file...."+reset)
-            #load the file if it exists, this will allow for faster
-            #classification times if the module has been already pre-trainned before
-            with open(trainning_file_name, 'rb') as inStrm:
-                trainning_data = pickle.load(inStrm)
+                    with open(labels_file_name, 'rb') as inStrm:
+                        labels_data = pickle.load(inStrm)
+                    self.__validate_length(trainning_data, trainning_file_name)
+                else:
+                    raise PathError("trainning path doesn't exist, and they's"+
+                            " no trainned model to read: %s" % self._train_path)
+            else:
+                #checking if a feature store made from the same trainning
+                #images, in the same way already exists. If it does, memory
+                #map that store. This will allow for faster classification
+                #times if the module has been already pre-trainned before, as
+                #only the pages which are used are read in from the disk.
+                #Every trainning image is stat-ed by the scan, so an image
+                #which was written over in place is still pre-processed again
+                trainning_data, labels_data = self.__refresh(store)
 
-            with open(labels_file_name, 'rb') as inStrm:
-                labels_data = pickle.load(inStrm)
-        else:
-            print(green+"creating a new file...."+reset)
-            #create a new file
-            in_path = self._train_path
-            #using image loading object for faster and efficient image loading
-            trainning_im = Image_Loader(in_path, self._mode)
-            #creating the labels based on the file name which the number belongs
-            #too
-            labels = trainning_im.create_labels()
-
-            trainning_data = []
-            labels_data =[]
-
-            #pre-pranning out trainning images, and our trainning data
-            for label in labels:
-                #opening each digit file and storing it at the trainning_im
-                #object
-                trainning_im.path = in_path +str(label)
-                #accessing every image inside the trainning_im object
-                for im in trainning_im:
-                    im = self.add_noise(im)
-                    im = Image.pad_image(self, im)
-                    im = Image.resize_image(self, im, 28, 40)
-                    trainning_data.append(im.flatten())
-                    labels_data.append(label)
-            trainning_data = np.array(trainning_data, dtype=np.float32)
-            labels_data = np.array(labels_data, dtype=np.float32)
-
-            with open(trainning_file_name, 'wb') as inStrm:
-                #creating a serilised file for future use
-                pickle.dump(trainning_data, inStrm)
-
-            with open(labels_file_name, 'wb') as inStrm:
-                #writing a labels serilised file for future use
-                pickle.dump(labels_data, inStrm)
-
-        knn = cv.ml.KNearest_create()
-        knn.train(trainning_data,cv.ml.ROW_SAMPLE, labels_data)
-
-        return knn
+            trainning_data = self.__project(store, trainning_data)
+        return self.__fit(trainning_data, labels_data)
+
+    def build_features(self, store):
+        """
+        IMPORT: store (Feature_Store)
+        EXPORT: trainning_data (numpy memmap), labels_data (numpy memmap)
+
+        PURPOSE: to pre-process every trainning image, and to write its
+        features straight into the store. Each augmented copy of an image is
+        its own row. The rows are split into chunks of the same label, and
+        the chunks are processed by a pool of processes which each write
+        their rows of the same trainning matrix
+        """
+        trainning_im, keys = self.__scan()
+        paths, labels = self.__rows(trainning_im)
+        if not paths:
+            raise PathError("no trainning images found in: %s" %
+                    self._train_path)
+
+        dtype = self.storage_types[self._storage][0]
+        trainning_data, labels_data = store.create(len(paths),
+                (self.__feature_length(),), dtype)
+        labels_data[:] = np.array(labels, dtype=np.float32)
+        sources = self.__make_sources(trainning_im, keys)
+        self.__build_rows(paths, labels, [source[0] for source in sources],
+                range(len(paths)), store.temp_file('features'), trainning_data)
+
+        trainning_data.flush()
+        labels_data.flush()
+        store.commit(self.fingerprint(sources), sources)
+
+        return store.open()
+
+    def update(self):
+        """
+        EXPORT: counts (tuple): the number of (new, changed, removed) images
+
+        PURPOSE: to add the trainning images which are new, or which have
+        changed since the feature store was made, without pre-processing
+        every image again. The new images are appended to the store, the
+        changed images are written over their old rows, and the kNN model is
+        fitted again. A store which was made in a different way, or which
+        doesn't know which image each row was made from is made again from
+        scratch
+        """
+        #the background thread has to finish with the store first
+        if self._train_thread is not None:
+            self._train_thread.join()
+        store = Feature_Store(self._store_path)
+        with self.__store_lock():
+            trainning_data, labels_data, counts = self.__refresh(store,
+                    counts=True)
+            trainning_data = self.__project(store, trainning_data)
+        old = self._trainner
+        self._trainner = self.__fit(trainning_data, labels_data)
+        if old is not None:
+            #the worker processes of a sharded index
+            old.close()
+
+        return counts
+
+    def fingerprint(self, sources):
+        """
+        IMPORT: sources (list): the source of each trainning image
+        EXPORT: fingerprint (dictionary)
+
+        PURPOSE: to describe how the feature store was made. The parameters
+        of the pre-processing, and the version of the code decide if the
+        store can be used at all, and the hash of the trainning images decide
+        if the store needs to be updated with the images which have changed
+        """
+        params = self.__params()
+        #sorting, so the order of the rows in the store doesn't matter
+        sources = sorted(sources)
+        return {
+            'params': params,
+            'dataset': self.__hash(sources),
+            'fingerprint': self.__hash([params, sources])
+        }
+
+    @classmethod
+    def storage_scale(cls, storage, extractor):
+        """
+        IMPORT: storage (string), extractor (Feature_Extractor)
+        EXPORT: scale (float)
+
+        PURPOSE: the scale which the features are multiplied by, so the
+        largest feature fits inside of the storage type
+        """
+        top = cls.storage_types[storage][1]
+        return 1.0 if top is None else top / extractor.max_value
 
     def classify(self, images, k=8):
         """
@@ -130,35 +357,527 @@ class Trainer(object):
             with python 4 Tutorial 36. https://www.youtube.com/watch?v=tOVwVvRy
             _Pg&ab_channel=Pysource
         """
+        test_data = self.features(images)
+        ret, result, neigbours, dist = self.trainner.find_nearest(test_data, k)
+        return result, dist
+
+    def classify_ks(self, images, ks=range(1, 16), labels=None):
+        """
+        IMPORT: images (list of uint8 numpy arrays i.e. images)
+                ks (iterable of integers): the values of k to vote with
+                labels (list): the true label of each image, if it's known
+        EXPORT: results (dictionary): the labels of the images for each k
+                dist (numpy array): the distances to the largest k neighbours
+                accuracy (dictionary): the fraction of the images which were
+                given their true label for each k, or None without labels
+
+        PURPOSE: to find the neighbours of the images once for the largest k,
+        and to vote on the label of each image with the closest k neighbours
+        for every other k. Hence, every k can be compared for the cost of one
+        search
+        """
+        ks = sorted(set(ks))
+        if not ks or ks[0] <= 0:
+            raise ParameterError("every k must be a positive integer: %s" %
+                    ks)
+
+        test_data = self.features(images)
+        #the neighbours are sorted from the closest to the furthest, so the
+        #closest k neighbours are the first k columns
+        neighbours, dist = self.trainner.search(test_data, ks[-1])
+        results = {k: self.trainner.vote(neighbours[:, :k]) for k in ks}
+
+        accuracy = None
+        if labels is not None:
+            truth = np.array(labels, dtype=np.float32).reshape(-1, 1)
+            accuracy = {k: float(np.mean(results[k] == truth))
+                    if len(truth) else 0.0 for k in ks}
+
+        return results, dist, accuracy
+
+    def features(self, images):
+        """
+        IMPORT: images (list of uint8 numpy arrays i.e. images)
+        EXPORT: test_data (2D numpy array of float32)
+
+        PURPOSE: to make the features of the images which are to be
+        classified, in the same way as the trainning features were made
+        """
         test_data = []
         for im in images:
-            #we need to pad the image, so the area of interest is away
-            #from the border of the image
-            im = Image.pad_image(self, im)
-            #this needs to be the same size as the provided trainning data
-            im = Image.resize_image(self,im, 28, 40)
-            test_data.append(im.flatten())
+            #the digits cropped out of an image are in colour, hence they're
+            #converted for a grayscale model
+            if self._mode == 'GRAY' and im.ndim == 3:
+                im = cv.cvtColor(im, cv.COLOR_BGR2GRAY)
+            im = self.prepare_digit(im, self._binarise)
+            test_data.append(self._extractor.extract(im))
         #knn classifier only accpets numpy arrays
         test_data = np.array(test_data, dtype=np.float32)
-        ret, result, neigbours, dist = self.trainner.findNearest(test_data, k)
-        return result, dist
+        #the test features have to be on the same scale as the stored
+        #features, they're kept as float32 as the distances are computed in
+        #float32
+        scale = self.storage_scale(self._storage, self._extractor)
+        if scale != 1.0:
+            test_data *= scale
+        if self._projection is not None:
+            test_data = self._projection.transform(test_data)
+        return test_data
+
+    @classmethod
+    def prepare_digit(cls, im, binarise=False):
+        """
+        IMPORT: im (numpy array of uint8), binarise (boolean)
+        EXPORT: im (numpy array of uint8)
+
+        PURPOSE: to get a digit ready for its features to be made, in the
+        same way for the trainning images, and the images to classify
+        """
+        #the image methods don't depend on the object which they're called on
+        #we need to pad the image, so the area of interest is away
+        #from the border of the image
+        im = Image.pad_image(None, im)
+        #this needs to be the same size as the provided trainning data
+        width, height = cls.digit_size
+        im = Image.resize_image(None, im, width, height)
+        if binarise:
+            im = Image.binarise(None, im)
+        return im
+
+    def classify_many(self, groups, k=8):
+        """
+        IMPORT: groups (list of lists of uint8 numpy arrays): the digits of
+                each image
+        EXPORT: list of (results, dist) tuples, one for each group
+
+        PURPOSE: to classify the digits of many images with one search of
+        the kNN model, and to split the results back up into the images
+        which the digits came from
+        """
+        images = [im for group in groups for im in group]
+        if not images:
+            return [(np.zeros((0, 1), dtype=np.float32),
+                np.zeros((0, k), dtype=np.float32)) for group in groups]
+
+        results, dist = self.classify(images, k)
+        #where the digits of each group end in the results
+        ends = np.cumsum([len(group) for group in groups])
+        starts = ends - [len(group) for group in groups]
+        return [(results[start:end], dist[start:end])
+                for start, end in zip(starts, ends)]
+
+    #===========================PRIVATE METHODS=================================
+    def __params(self, **changes):
+        """
+        IMPORT: changes: parameters which are different to this trainner's
+        EXPORT: params (dictionary)
+
+        PURPOSE: the parameters of how the trainning features are made
+        """
+        params = {
+            'feature_version': self.feature_version,
+            'mode': self._mode,
+            'digit_size': list(self.digit_size),
+            'storage': self._storage,
+            'features': self._features,
+            'binarise': self._binarise
+        }
+        #the seed, and the number of copies are a part of the parameters, so
+        #a store of differently augmented images isn't used
+        params.update(self._augmenter.params)
+        params.update(changes)
+        return params
+
+    def __validate_store(self, params, path):
+        """
+        IMPORT: params (dictionary): how the stored features were made
+                path (string)
+
+        PURPOSE: to validate that stored features, which can't be made again
+        from the trainning images, were made in the same way as this
+        trainner makes the features of the digits to classify
+        """
+        mine = self.__params()
+        #the seed, and the noise only decide which trainning features were
+        #made, they don't change what the features are
+        keys = ('feature_version', 'mode', 'digit_size', 'storage',
+                'features', 'binarise')
+        if params is None or any(params.get(key) != mine[key]
+                for key in keys):
+            raise StoreError("""
+            the trainning features at:
+            %s
+            were made with:
+            %s
+            this trainner needs:
+            %s
+            the trainning images are needed to make the features again
+            """ % (path, {key: (params or {}).get(key) for key in keys},
+                {key: mine[key] for key in keys}))
+
+    def __validate_length(self, trainning_data, path):
+        """
+        IMPORT: trainning_data (numpy array), path (string)
+        """
+        length = self._extractor.length()
+        if trainning_data.ndim != 2 or trainning_data.shape[1] != length:
+            raise StoreError(("the trainning features at %s have %s "+
+                "features in each row, not %d") % (path,
+                    trainning_data.shape[1:], length))
+
+    def __fit(self, trainning_data, labels_data):
+        """
+        IMPORT: trainning_data (numpy array), labels_data (numpy array)
+        EXPORT: index (Index)
+        """
+        index = Index.create(self._index, **self._index_params)
+        index.train(trainning_data, labels_data)
+
+        return index
+
+    def __store_lock(self):
+        """
+        EXPORT: lock (threading.Lock): the lock of the feature store of this
+                trainner
+        """
+        key = os.path.abspath(self._store_path)
+        with Trainer._store_locks_guard:
+            return Trainer._store_locks.setdefault(key, threading.Lock())
+
+    def __project(self, store, trainning_data):
+        """
+        IMPORT: store (Feature_Store), trainning_data (numpy array)
+        EXPORT: trainning_data (numpy array)
+
+        PURPOSE: to project the trainning features, if a projection was
+        chosen. The projection saved with the store is used if it was fitted
+        on the same features, otherwise it's fitted again and saved with the
+        store
+        """
+        if self._projection is None:
+            return trainning_data
+
+        key = store.metadata.get('fingerprint') if store.exists() else None
+        if key is None or not self._projection.load(store.path, key):
+            print(green+"fitting %s projection...." %
+                    self._projection.method+reset)
+            self._projection.fit(trainning_data, key)
+            #the features of the old serilised files don't have a store to
+            #save the projection with
+            if key is not None:
+                self._projection.save(store.path)
+
+        return self._projection.transform(trainning_data)
 
+    def __refresh(self, store, counts=False):
+        """
+        IMPORT: store (Feature_Store), counts (boolean)
+        EXPORT: trainning_data (numpy memmap), labels_data (numpy memmap),
+                and the (new, changed, removed) counts if counts is true
+
+        PURPOSE: to bring the feature store up to date with the trainning
+        images. The store is made again if it was made with different
+        parameters, or by a different version of the code. If only the
+        trainning images have changed, then only the images which are new or
+        have changed are pre-processed
+        """
+        trainning_im, keys = self.__scan()
+        scanned = self.__make_sources(trainning_im, keys)
+        row_paths, row_labels = self.__rows(trainning_im)
+        fingerprint = self.fingerprint(scanned)
+
+        if not store.exists() or store.sources is None or \
+        store.metadata.get('params') != fingerprint['params']:
+            print(green+"creating a new file...."+reset)
+            res = self.build_features(store)
+            return res + ((len(scanned), 0, 0),) if counts else res
+
+        if store.metadata.get('fingerprint') == fingerprint['fingerprint']:
+            print(green+"reading in feature store...."+reset)
+            res = store.open()
+            return res + ((0, 0, 0),) if counts else res
+
+        old_rows = {}
+        for row, source in enumerate(store.sources):
+            old_rows[source[0]] = (row, source)
+
+        nw_indxs = []
+        changed_rows = {}
+        for indx, source in enumerate(scanned):
+            old = old_rows.pop(source[0], None)
+            if old is None:
+                nw_indxs.append(indx)
+            elif old[1] != source:
+                changed_rows[old[0]] = indx
+        nw_counts = (len(nw_indxs), len(changed_rows), len(old_rows))
+
+        #what is left over are the images which have been removed
+        if old_rows:
+            print(green+"images removed, creating a new file...."+reset)
+            res = self.build_features(store)
+            return res + (nw_counts,) if counts else res
+
+        print(green+"updating feature store...."+reset)
+        sources = store.sources
+        start = store.rows
+        #the changed rows are written into a copy of the arrays, so the
+        #readers of the store don't see their rows change
+        trainning_data, labels_data = store.extend(len(nw_indxs),
+                rewrite=bool(changed_rows))
 
+        #the rows which have to be pre-processed, and the index of the
+        #image which each row is made from
+        rows = sorted(changed_rows) + list(range(start, start + len(nw_indxs)))
+        indxs = [changed_rows[row] for row in sorted(changed_rows)] + nw_indxs
+        paths = [row_paths[indx] for indx in indxs]
+        row_keys = [scanned[indx][0] for indx in indxs]
+        labels = [row_labels[indx] for indx in indxs]
+
+        for row, indx in zip(rows, indxs):
+            labels_data[row] = float(row_labels[indx])
+            if row < start:
+                sources[row] = scanned[indx]
+        sources.extend(scanned[indx] for indx in nw_indxs)
+
+        self.__build_rows(paths, labels, row_keys, rows,
+                store.pending_file('features'), trainning_data)
+        trainning_data.flush()
+        labels_data.flush()
+        store.commit(self.fingerprint(sources), sources)
+
+        res = store.open()
+        return res + (nw_counts,) if counts else res
+
+    def __hash(self, obj):
+        """
+        IMPORT: obj (anything which can be written as JSON)
+        EXPORT: hex digest (string)
+        """
+        data = json.dumps(obj, sort_keys=True).encode()
+        return hashlib.sha1(data).hexdigest()
+
+    def __scan(self):
+        """
+        EXPORT: trainning_im (Image_Loader), keys (list)
+
+        PURPOSE: to find every trainning image. The key of each image is its
+        path relative to the trainning path, so the same image has the same
+        key regardless of how the trainning path was written
+        """
+        in_path = self._train_path
+        #using image loading object for faster and efficient image loading.
+        #The manifest finds every image inside of the digit directories in
+        #one scan, and the label of each image is the directory it's in
+        trainning_im = Image_Loader(in_path, self._mode,
+                manifest=self._manifest_path or True)
+        if os.path.isdir(in_path):
+            keys = [os.path.relpath(path, in_path)
+                    for path in trainning_im.data]
+        else:
+            keys = list(trainning_im.data)
+
+        return trainning_im, keys
+
+    def __make_sources(self, trainning_im, keys):
+        """
+        IMPORT: trainning_im (Image_Loader), keys (list)
+        EXPORT: sources (list of [key, signature])
+
+        PURPOSE: to make the source of each row of the feature store. Lists
+        are used, so the sources compare equal after been read from the store.
+        The first copy of an image has the key of the image, and the other
+        copies have the number of the copy added onto the key
+        """
+        sources = []
+        for key, signature in zip(keys, trainning_im.signatures):
+            for copy in range(self._augmenter.copies):
+                copy_key = key if copy == 0 else '%s#%d' % (key, copy)
+                sources.append([copy_key, list(signature)])
+        return sources
+
+    def __rows(self, trainning_im):
+        """
+        IMPORT: trainning_im (Image_Loader)
+        EXPORT: paths (list), labels (list): the image, and the label of each
+                row of the feature store
+        """
+        copies = self._augmenter.copies
+        paths = [path for path in trainning_im.data for copy in range(copies)]
+        labels = [label for label in trainning_im.labels
+                for copy in range(copies)]
+        return paths, labels
+
+    def __feature_length(self):
+        """
+        EXPORT: the number of features in each row of the trainning matrix
+        """
+        return self._extractor.length()
+
+    def __build_rows(self, paths, labels, keys, rows, features_file,
+            trainning_data):
+        """
+        IMPORT: paths (list), labels (list),
+                keys (list): the source key of each row, which seeds the
+                noise of the row
+                rows (list of integers): the row which each path goes to
+                features_file (string): the file of the trainning matrix
+                trainning_data (numpy memmap): the trainning matrix
+        PURPOSE: to split the paths into chunks of the same label, and to
+        pre-process the chunks in a pool of processes, which each write
+        their rows straight into the trainning matrix
+        """
+        in_path = self._train_path
+        #a zip file has to be opened by each worker, but the paths inside of
+        #a directory can be loaded straight away
+        source = in_path if isinstance(in_path, str) and \
+        in_path.lower().endswith(".zip") else None
+        shape = trainning_data.shape
+        rows = list(rows)
+
+        #how every row is made, which is the same for every task
+        options = {
+            'mode': self._mode,
+            'storage': self._storage,
+            'features': self._features,
+            'augmenter': self._augmenter,
+            'binarise': self._binarise
+        }
+
+        #the images of each label are next to each other, as the manifest
+        #is sorted by directory
+        tasks = []
+        start = 0
+        while start < len(paths):
+            end = start + 1
+            while end < len(paths) and labels[end] == labels[start] and \
+            end - start < self.chunk_size:
+                end += 1
+            tasks.append((source, paths[start:end], keys[start:end],
+                features_file, shape, rows[start:end], options))
+            start = end
+
+        if self._workers > 1 and len(tasks) > 1:
+            trainning_data.flush()
+            #the model can be trainned by a background thread whilst other
+            #threads are running, and forking a process with many threads
+            #can leave the locks of the other threads held in the workers
+            context = multiprocessing.get_context('spawn')
+            with ProcessPoolExecutor(max_workers=self._workers,
+                    mp_context=context) as pool:
+                #list is needed, so any exception in a worker is raised here
+                list(pool.map(_build_rows, tasks))
+        else:
+            for task in tasks:
+                _build_rows(task, trainning_data)
+
+    def __train_thread(self):
+        """
+        PURPOSE: to train the kNN model inside of the background thread,
+        keeping any exception so it can be raised by the thread which needs
+        the model
+        """
+        try:
+            self._trainner = self.train()
+        except Exception as err:
+            self._train_error = err
+
+    def __validate_load(self, load):
+        """
+        IMPORT: load (string)
+        EXPORT: load (string)
+        """
+        if load not in self.loads:
+            raise ParameterError("""
+            load of:
+            %s
+            the load must be one of these:
+            %s
+            """ % (load, self.loads))
+        return load
+
+    def __validate_binarise(self, binarise):
+        """
+        IMPORT: binarise (boolean)
+        EXPORT: binarise (boolean)
+        """
+        if binarise and self._mode != 'GRAY':
+            raise ParameterError("only a GRAY model can be binarised, not a"+
+                    " model in the mode: %s" % self._mode)
+        return bool(binarise)
+
+    def __validate_storage(self, storage):
+        """
+        IMPORT: storage (string)
+        EXPORT: storage (string)
+        """
+        if storage not in self.storage_types:
+            raise ParameterError("""
+            storage type of:
+            %s
+            the storage type must be one of these:
+            %s
+            """ % (storage, sorted(self.storage_types)))
+        return storage
 
     #AUGMENTATION OPERATION METHODS
-    def add_noise(self, im):
+    def add_noise(self, im, key=None):
         """
         IMPORT: im (numpy array data type: uint8)
+                key (integer or string): the same key always gives the same
+                noise, None gives new noise on every call
         EXPORT: im (numpy array data type: uint8)
 
         PURPOSE: it's to add noise to an image, to stop the trainner to
-        over-fitting to the provided trainning data.
+        over-fitting to the provided trainning data. The trainning images
+        are augmented a chunk at a time by the Augmenter instead
         """
-        mean = (5,5,5)
-        sigma = (5, 5, 5)
-        noise = np.zeros(im.shape, dtype='int8')
-        #75 works well
-        cv.randn(noise, (25, 25, 25), (200, 200, 200))
+        return self._augmenter.augment([im], [key])[0]
+
+
+def _build_rows(task, trainning_data=None):
+    """
+    IMPORT: task (tuple): (source, paths, keys, features file, shape, rows,
+            options): options is a dictionary of the mode, storage, features,
+            augmenter and binarise of the Trainer
+            trainning_data (numpy memmap): the trainning matrix, if it's
+            already open in this process
+    EXPORT: the number of rows which were written
+
+    PURPOSE: to pre-process a chunk of the trainning images, and to write
+    the features of each image into its row of the trainning matrix. This is
+    a function of the module, so it can be sent to a worker process
+    """
+    source, paths, keys, features_file, shape, rows, options = task
+    mode = options['mode']
+    extractor = Feature_Extractor.create(options['features'], mode,
+            Trainer.digit_size)
+    dtype = Trainer.storage_types[options['storage']][0]
+    scale = Trainer.storage_scale(options['storage'], extractor)
+    if trainning_data is None:
+        trainning_data = np.memmap(features_file, dtype=dtype,
+                mode='r+', shape=shape)
+
+    loader = Image_Loader(source, mode)
+    #the copies of an image are next to each other, so each image is only
+    #loaded once
+    images = []
+    for path in paths:
+        if not images or path != last_path:
+            im = loader.load_image(path)
+            last_path = path
+        images.append(im)
+
+    #the noise of each row is keyed by the source of the row, so a row gets
+    #the same noise regardless of which chunk, or worker it's processed in
+    images = options['augmenter'].augment(images, keys)
+    for im, row in zip(images, rows):
+        im = Trainer.prepare_digit(im, options['binarise'])
+        values = extractor.extract(im)
+        if scale != 1.0:
+            values = values * np.float32(scale)
+            #rounding rather than truncating into an integer type
+            if np.issubdtype(dtype, np.integer):
+                values = np.rint(values)
+        trainning_data[row] = values
 
-        ret = cv.add(im, noise, dtype=cv.CV_8UC3)
-        return ret
+    trainning_data.flush()
+    return len(paths)
@@ -0,0 +1,177 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE OF FILE: to watch a drop directory for new images, so the programme
+can keep running and recognise the house numbers of images as they arrive,
+instead of being started again for every batch of images. Every image which
+has been processed is recorded in a ledger inside of the drop directory, so
+the images aren't processed again when the programme is restarted
+"""
+
+import os
+import time
+from collections import deque
+from Errors import *
+from Colours import *
+
+class Watch_Folder(object):
+    """
+    The drop directory is polled for new images. An image is only queued once
+    its size, and modification time haven't changed between two polls, so an
+    image which is still been copied into the directory isn't read half way
+    through been written
+    """
+
+    ext = (".png", ".jpg", ".jpeg")
+    ledger_name = ".processed"
+
+    def __init__(self, path, handler, interval=1.0):
+        self._path = self.__validate_path(path)
+        #handler is called with the path of each new image
+        self._handler = handler
+        self._interval = interval
+        self._ledger_path = os.path.join(path, self.ledger_name)
+        self._processed = self.__read_ledger()
+        #images which have been seen, but might still be been written to
+        self._unstable = {}
+        self._queue = deque()
+        self._queued = set()
+        self._dir_mtime = None
+        self._running = False
+
+    #===========================ACCESORS========================================
+    @property
+    def path(self):
+        return self._path
+
+    @property
+    def processed(self):
+        return self._processed
+
+    @property
+    def queue(self):
+        return self._queue
+
+    #===========================PUBLIC METHODS==================================
+    def poll(self):
+        """
+        EXPORT: nw_images (list)
+
+        PURPOSE: to look for new images inside of the drop directory, and to
+        add the images which have finished been written to the queue. The
+        directory is only listed again if its modification time has changed,
+        or if they're images which were still been written
+        """
+        mtime = os.stat(self._path).st_mtime_ns
+        if mtime == self._dir_mtime and not self._unstable:
+            return []
+        self._dir_mtime = mtime
+
+        nw_images = []
+        with os.scandir(self._path) as it:
+            for entry in it:
+                name = entry.name
+                if not name.lower().endswith(self.ext) or \
+                name in self._processed or name in self._queued or \
+                not entry.is_file():
+                    continue
+
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if self._unstable.get(name) == signature:
+                    del self._unstable[name]
+                    self._queue.append(name)
+                    self._queued.add(name)
+                    nw_images.append(name)
+                else:
+                    self._unstable[name] = signature
+
+        return nw_images
+
+    def process_queue(self):
+        """
+        EXPORT: count (integer)
+
+        PURPOSE: to hand every queued image to the handler, and to record it
+        in the ledger. An image which the handler raises an exception on is
+        recorded as failed, so a broken image isn't retried forever
+        """
+        count = 0
+        while self._queue:
+            name = self._queue.popleft()
+            try:
+                self._handler(os.path.join(self._path, name))
+                status = 'done'
+            except Exception as err:
+                print(red+"failed to process %s: %s" % (name, err)+reset)
+                status = 'failed'
+
+            self.__record(name, status)
+            self._queued.discard(name)
+            count += 1
+
+        return count
+
+    def run(self, max_polls=None):
+        """
+        IMPORT: max_polls (integer or None)
+
+        PURPOSE: to keep polling the drop directory, and processing the new
+        images until stop is called, or the number of polls is reached
+        """
+        self._running = True
+        polls = 0
+        print(green+"watching %s for new images...." % self._path+reset)
+        while self._running and (max_polls is None or polls < max_polls):
+            self.poll()
+            self.process_queue()
+            polls += 1
+            if self._running and (max_polls is None or polls < max_polls):
+                time.sleep(self._interval)
+
+    def stop(self):
+        """
+        PURPOSE: to stop the run loop after the current poll
+        """
+        self._running = False
+
+    #===========================PRIVATE METHODS=================================
+    def __read_ledger(self):
+        """
+        EXPORT: processed (dictionary of name to status)
+
+        PURPOSE: to read which images were processed by an earlier run
+        """
+        processed = {}
+        if os.path.isfile(self._ledger_path):
+            with open(self._ledger_path, 'r') as inStrm:
+                for line in inStrm:
+                    name, _, status = line.rstrip('\n').rpartition('\t')
+                    if name:
+                        processed[name] = status
+        return processed
+
+    def __record(self, name, status):
+        """
+        IMPORT: name (string), status (string)
+
+        PURPOSE: to append an image to the ledger straight away, so a crash
+        won't make the programme process the image again
+        """
+        self._processed[name] = status
+        with open(self._ledger_path, 'a') as outStrm:
+            outStrm.write('%s\t%s\n' % (name, status))
+            outStrm.flush()
+            os.fsync(outStrm.fileno())
+
+    def __validate_path(self, path):
+        """
+        IMPORT: path (string)
+        EXPORT: path (string)
+
+        PURPOSE: to validate that the drop directory is a directory
+        """
+        if not isinstance(path, str) or not os.path.isdir(path):
+            raise PathError("watch path is not a valid directory: %s" % path)
+        return path
@@ -0,0 +1,76 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE OF FILE: a micro-benchmark of the cost of loading an image in each of
+the modes of Image_Loader. Each mode is timed by decoding to BGR and then
+converting to the mode (how the images used to be loaded), and by the mode
+dispatch table of Image_Loader.load_image
+
+USAGE:
+    python3 bench_ImageLoader.py [path] [--repeats N]
+"""
+import argparse
+import time
+import cv2 as cv
+from ImageLoader import *
+from Colours import *
+
+def decode_then_convert(path, mode):
+    """
+    IMPORT: path (string), mode (string)
+    EXPORT: im (numpy array)
+
+    PURPOSE: to load an image the way which Image_Loader used to load images,
+    so it can be compared against the mode dispatch table
+    """
+    im = cv.imread(path)
+    conversion = {
+        'GRAY': cv.COLOR_BGR2GRAY,
+        'HSV': cv.COLOR_BGR2HSV,
+        'LUV': cv.COLOR_BGR2Luv,
+        'LAB': cv.COLOR_BGR2Lab,
+        'RGB': cv.COLOR_BGR2RGB
+    }.get(mode)
+    if conversion is not None:
+        im = cv.cvtColor(im, conversion)
+    return im
+
+def time_per_image(load, paths, repeats):
+    """
+    IMPORT: load (function of a path), paths (list), repeats (integer)
+    EXPORT: the mean time in micro-seconds to load one image
+
+    PURPOSE: to time loading every path, taking the best of the repeats so
+    the result isn't thrown off by the first cold read of the files
+    """
+    best = float('inf')
+    for ii in range(repeats):
+        start = time.perf_counter()
+        for path in paths:
+            load(path)
+        best = min(best, time.perf_counter() - start)
+    return best / len(paths) * 1e6
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="time loading images in "+
+            "each mode of Image_Loader")
+    parser.add_argument('path', nargs='?', default='../train_updated/')
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    #the images are listed straight from the directory, so a manifest isn't
+    #written next to the images which are timed
+    loader = Image_Loader(args.path)
+    paths = [path for path in loader.data
+            if path.lower().endswith(Image_Loader.ext)]
+    print(green+"%d images from %s" % (len(paths), args.path)+reset)
+    print("%-6s %18s %18s %8s" % ("mode", "decode+convert us",
+            "dispatch table us", "speedup"))
+
+    for mode in Image_Loader.modes:
+        loader.mode = mode
+        old = time_per_image(lambda path: decode_then_convert(path, mode),
+                paths, args.repeats)
+        nw = time_per_image(loader.load_image, paths, args.repeats)
+        print("%-6s %18.1f %18.1f %7.2fx" % (mode, old, nw, old / nw))
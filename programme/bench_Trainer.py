@@ -0,0 +1,223 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE OF FILE: a benchmark of the speed, and the accuracy of the kNN
+classifier of Trainer. The labelled digit directories are split into a
+trainning set, and a held out test set with the same share of each digit.
+Each configuration of Trainer is trainned on the trainning set, and the
+held out digits are classified one at a time. The results are written as
+JSON, so every change to the classifier can be compared against them
+
+USAGE:
+    python3 bench_Trainer.py [path] [--test-size F] [--seed N] [--k N]
+                             [--config JSON]... [--output FILE]
+
+    each --config is a JSON object of the keyword arguments of Trainer i.e.
+        --config '{"index": "kdtree"}' --config '{"features": "hog"}'
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import resource
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from Colours import *
+
+def stratified_split(path, test_size, seed, manifest_path=None):
+    """
+    IMPORT: path (string): the directory of the labelled digit directories
+            test_size (float): the share of each digit which is held out
+            seed (integer)
+            manifest_path (string): where the manifest of path is written,
+            None writes it next to path
+    EXPORT: train (list), test (list): (path, label) of each image
+
+    PURPOSE: to hold out the same share of the images of each digit. Every
+    digit with more than one image keeps at least one image in each set
+    """
+    #the manifest lists every image with the directory it's in as its label
+    from ImageLoader import Image_Loader
+    loader = Image_Loader(path, manifest=manifest_path or True)
+    by_label = {}
+    for im_path, label in zip(loader.data, loader.labels):
+        by_label.setdefault(label, []).append(im_path)
+
+    rng = np.random.default_rng(seed)
+    train = []
+    test = []
+    for label in sorted(by_label):
+        paths = by_label[label]
+        order = rng.permutation(len(paths))
+        held_out = int(round(test_size * len(paths)))
+        if len(paths) > 1:
+            held_out = min(max(held_out, 1), len(paths) - 1)
+        for ii, indx in enumerate(order):
+            entry = (paths[indx], label)
+            if ii < held_out:
+                test.append(entry)
+            else:
+                train.append(entry)
+
+    return train, test
+
+def make_train_dir(train, out_dir):
+    """
+    IMPORT: train (list of (path, label)), out_dir (string)
+
+    PURPOSE: to lay the trainning images out as labelled directories, so
+    Trainer can be trainned on them. The images are hard linked where the
+    file system allows it, instead of been copied
+    """
+    for ii, (path, label) in enumerate(train):
+        label_dir = os.path.join(out_dir, label)
+        os.makedirs(label_dir, exist_ok=True)
+        #numbering the files, as images of different directories can share
+        #the same name
+        dst = os.path.join(label_dir, '%05d_%s' % (ii, os.path.basename(path)))
+        try:
+            os.link(path, dst)
+        except OSError:
+            shutil.copy(path, dst)
+
+def peak_memory():
+    """
+    EXPORT: the peak resident memory in bytes, of this process or of any
+    process which it has waited for
+    """
+    usage = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    #linux reports kilobytes, macOS reports bytes
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+def run_config(config, train_dir, test, k, work_dir):
+    """
+    IMPORT: config (dictionary): the keyword arguments of Trainer
+            train_dir (string), test (list of (path, label)), k (integer)
+            work_dir (string): where the feature store is made
+    EXPORT: result (dictionary)
+
+    PURPOSE: to train, and load one configuration of Trainer, and to
+    classify each held out digit by itself. This is run in its own process,
+    so the peak memory only belongs to this configuration
+    """
+    #the status messages of Trainer would end up inside of the JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        return _run_config(config, train_dir, test, k, work_dir)
+
+def _run_config(config, train_dir, test, k, work_dir):
+    from Trainer import Trainer
+    from ImageLoader import Image_Loader
+
+    kwargs = {'mode': 'BGR', 'workers': 1}
+    kwargs.update(config)
+    kwargs.update({'train_path': train_dir, 'val_path': None,
+        'store_path': os.path.join(work_dir, 'kNN_store')})
+
+    #the first trainner makes the feature store, and the second one reads
+    #the store back in like a later run of the programme would
+    start = time.perf_counter()
+    Trainer(**kwargs)
+    train_time = time.perf_counter() - start
+    start = time.perf_counter()
+    trainner = Trainer(**kwargs)
+    load_time = time.perf_counter() - start
+
+    loader = Image_Loader(None, kwargs['mode'])
+    images = [loader.load_image(path) for path, label in test]
+    truth = [int(label) for path, label in test]
+    predicted = []
+    latencies = []
+    for im in images:
+        start = time.perf_counter()
+        result, dist = trainner.classify([im], k)
+        latencies.append(time.perf_counter() - start)
+        predicted.append(int(result[0][0]))
+
+    labels = sorted(set(truth) | set(predicted))
+    confusion = np.zeros((len(labels), len(labels)), dtype=np.int64)
+    for true, pred in zip(truth, predicted):
+        confusion[labels.index(true), labels.index(pred)] += 1
+    per_class = {}
+    for ii, label in enumerate(labels):
+        total = int(confusion[ii].sum())
+        if total:
+            per_class[str(label)] = float(confusion[ii, ii]) / total
+
+    latencies = np.array(latencies) * 1e3
+    return {
+        'config': config,
+        'train_time': train_time,
+        'load_time': load_time,
+        'latency_ms': {
+            'p50': float(np.percentile(latencies, 50)),
+            'p95': float(np.percentile(latencies, 95)),
+            'p99': float(np.percentile(latencies, 99)),
+            'mean': float(latencies.mean())
+        } if len(latencies) else None,
+        'accuracy': float(np.mean(np.array(truth) == predicted))
+            if truth else None,
+        'per_class_accuracy': per_class,
+        'labels': labels,
+        'confusion_matrix': confusion.tolist(),
+        'index': trainner.index_stats,
+        'peak_memory': peak_memory()
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="benchmark the speed, and "+
+            "the accuracy of the digit classifier")
+    parser.add_argument('path', nargs='?', default='../Digits-2020S2/')
+    parser.add_argument('--test-size', type=float, default=0.25)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--k', type=int, default=8)
+    parser.add_argument('--config', action='append', type=json.loads,
+            help="a JSON object of the keyword arguments of Trainer")
+    parser.add_argument('--output', help="the file the JSON is written to,"+
+            " the standard output is used by defualt")
+    args = parser.parse_args()
+    configs = args.config or [{}]
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        #the benchmark doesn't leave a manifest behind next to the data set
+        train, test = stratified_split(args.path, args.test_size, args.seed,
+                os.path.join(tmp_dir, 'dataset.manifest'))
+        print(green+"%d trainning images, %d held out images" % (len(train),
+            len(test))+reset, file=sys.stderr)
+
+        train_dir = os.path.join(tmp_dir, 'train')
+        make_train_dir(train, train_dir)
+        #a new interpreter for each configuration, so the peak memory of one
+        #configuration isn't carried over into the next one
+        context = multiprocessing.get_context('spawn')
+        for ii, config in enumerate(configs):
+            work_dir = os.path.join(tmp_dir, 'config%d' % ii)
+            os.makedirs(work_dir)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                result = pool.submit(run_config, config, train_dir, test,
+                        args.k, work_dir).result()
+            print(green+"%s: accuracy %.3f, p50 %.3f ms" % (json.dumps(config),
+                result['accuracy'] or 0, (result['latency_ms'] or
+                    {'p50': 0})['p50'])+reset, file=sys.stderr)
+            results.append(result)
+
+    report = {
+        'dataset': args.path,
+        'split': {'test_size': args.test_size, 'seed': args.seed,
+            'train': len(train), 'test': len(test)},
+        'k': args.k,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w') as outStrm:
+            json.dump(report, outStrm, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
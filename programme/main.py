@@ -8,6 +8,23 @@ PURPOSE OF FILE: this is the main of the programme hence, it is to facilate
 the functionaility of this assigment. Therefore, it brings all classes created
 in order to detect numbers given an input image, crop the digits, save the
 necessary files, and to classfity the images
+
+USAGE:
+    python3 main.py                   : recognise every image in test_path
+    python3 main.py --batch N         : the digits of N images are classified
+                                        together (defualt 64)
+    python3 main.py --gray            : classify the digits with a grayscale
+                                        model, --binarise thresholds each
+                                        grayscale digit as well
+    python3 main.py --cascade         : classify the digits with a small PCA
+                                        model first, and only use the full
+                                        model for the ambiguous digits
+    python3 main.py --watch DIRECTORY : keep recognising new images which are
+                                        dropped into DIRECTORY
+    python3 main.py --stdin           : recognise the images piped into the
+                                        standard input, each image is written
+                                        as its 4 byte big-endian length
+                                        followed by the encoded image
 """
 import argparse
 from Trainer import *
@@ -15,55 +32,209 @@ from Image import *
 import os
 from ImageLoader import *
 from Colours import *
+from Watcher import *
+from Cascade import *
 #paths of the located files:
 test_path = '/home/student/test/'
 trainning_path = '/home/student/train/'
 val_path = '/home/student/val'
 
+def extract(image, im_id):
+    """
+    IMPORT: image (numpy array of datatype uint8), im_id (integer or string)
+    EXPORT: digits (list of numpy arrays) or None if the digits couldn't be
+            extracted
+
+    PURPOSE: to extract the digits of a house number out of an image
+    """
+    try:
+        digits = Image(image, im_id)
+    #this  is bad programming practice. Although, they is far too many
+    #things which can go wrong in terms with the assertions and exceptions
+    #thrown by openCV, and the bounding boxes. Therefore, for efficient use
+    #of time, I am going to catch all of them
+    except:
+        #if that image throws an exception, it means that the bounding boxes
+        #of that image can't be found and it has failed the extraction
+        print(red+"image couldn't extraxt images as"+
+                " bounding boxes couldn't be found"+reset)
+        return None
+
+    return digits.im[1]
+
+def save(result, im_id):
+    """
+    IMPORT: result (numpy array): the label of each digit, im_id (integer or
+            string)
+    EXPORT: house_num (string)
+
+    PURPOSE: to save the house number made by the classified digits to the
+    output file of the image
+    """
+    base_file_name = 'output/House'
+    #creating the file name based on the numbers found
+    #I need to use list operations in able to convert the number found in
+    #numpy into a whole string
+    house_num = result.tolist()
+    #the results of the numbers are stored in a 2-dimensional array, whereby
+    #they's only  one number inside in the second dimension of the array
+    #hence, I am just extracting all those numbers from that second
+    #dimension
+    house_num = [int(house_num[ii][0]) for ii in range(len(house_num))]
+    #taking a house number from an array of strings, and converting it to
+    #just a string by itself
+    house_num = ''.join(map(str, house_num))
+    print(green+"HOUSE NUMBER:"+reset, house_num)
+    complete_file_name = base_file_name + str(im_id) + ".txt"
+
+    with open(complete_file_name, 'w') as inStrm:
+        inStrm.write('Building {}'. format(house_num))
+
+    return house_num
+
+def recognise(trainner, image, im_id):
+    """
+    IMPORT: trainner (Trainer), image (numpy array of datatype uint8),
+            im_id (integer or string)
+    EXPORT: house_num (string) or None if the digits couldn't be extracted
+
+    PURPOSE: to extract the digits of a house number out of an image, to
+    classify those digits, and to save the house number to the output file
+    """
+    digits = extract(image, im_id)
+    if digits is None:
+        return None
+
+    #indexing 1 as I only the result of the classifify as classify returns
+    #the result and the distance of the image
+    result, other = trainner.classify(digits)
+    return save(result, im_id)
+
+def recognise_batches(trainner, images, batch_size):
+    """
+    IMPORT: trainner (Trainer), images (iterable of (im_id, image)),
+            batch_size (integer)
+    EXPORT: house_nums (dictionary): the house number of each image which
+            the digits could be extracted from
+
+    PURPOSE: to extract the digits of many images, and to classify all of
+    their digits with one search of the kNN model, instead of one search for
+    each image
+    """
+    house_nums = {}
+    pending = []
+
+    def flush():
+        groups = [digits for im_id, digits in pending]
+        for (im_id, digits), (result, other) in zip(pending,
+                trainner.classify_many(groups)):
+            house_nums[im_id] = save(result, im_id)
+        del pending[:]
+
+    for im_id, image in images:
+        digits = extract(image, im_id)
+        if digits is not None:
+            pending.append((im_id, digits))
+        if len(pending) >= batch_size:
+            flush()
+
+    if pending:
+        flush()
+
+    return house_nums
+
+def watch(trainner, path, interval):
+    """
+    IMPORT: trainner (Trainer), path (string), interval (float)
+
+    PURPOSE: to keep recognising the images which are dropped into the
+    directory at path, using the same trainned model for every image
+    """
+    #get_ROI shrinks large images anyway, so they can be decoded smaller
+    loader = Image_Loader(path, 'BGR', size_hint=Image.resize_limit)
+
+    def handler(im_path):
+        #naming the output files after the image, as the number of images
+        #will keep on growing between restarts
+        im_id = os.path.splitext(os.path.basename(im_path))[0]
+        #raising, so the watcher records the image as failed rather than done
+        if recognise(trainner, loader.load_image(im_path), im_id) is None:
+            raise ImageError("the digits couldn't be extracted from: %s" %
+                    im_path)
+
+    watcher = Watch_Folder(path, handler, interval)
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        print(green+"stopped watching %s" % path+reset)
+
 if __name__ == '__main__':
-    #extracting the region of interest to the output file
-    trainning_images = Image_Loader(trainning_path, 'BGR')
-    test_images = Image_Loader(test_path, 'BGR')
-    trainner = Trainer(train_path=trainning_path, val_path=test_path,
-            mode='BGR')
-
-    results = []
-    dists = []
-    digits_ls = []
-    #im_id is needed so that we can save the files with a unique id but with
-    #the same starting string
-    for im_id, image in enumerate(test_images):
-        try:
-            digits = Image(image, im_id)
-        #this  is bad programming practice. Although, they is far too many
-        #things which can go wrong in terms with the assertions and exceptions
-        #thrown by openCV, and the bounding boxes. Therefore, for efficient use
-        #of time, I am going to catch all of them
-        except:
-            #if that image throws an exception, it means that the bounding boxes
-            #of that image can't be found and it has failed the extraction
-            print(red+"image couldn't extraxt images as"+
-                    " bounding boxes couldn't be found"+reset)
-
-
-        #indexing 1 as I only the result of the classifify as classify returns
-        #the result and the distance of the image
-        result, other = trainner.classify(digits.im[1])
-        base_file_name = 'output/House'
-        #creating the file name based on the numbers found
-        #I need to use list operations in able to convert the number found in
-        #numpy into a whole string
-        house_num = result.tolist()
-        #the results of the numbers are stored in a 2-dimensional array, whereby
-        #they's only  one number inside in the second dimension of the array
-        #hence, I am just extracting all those numbers from that second
-        #dimension
-        house_num = [int(house_num[ii][0]) for ii in range(len(house_num))]
-        #taking a house number from an array of strings, and converting it to
-        #just a string by itself
-        house_num = ''.join(map(str, house_num))
-        print(green+"HOUSE NUMBER:"+reset, house_num)
-        complete_file_name = base_file_name + str(im_id) + ".txt"
-
-        with open(complete_file_name, 'w') as inStrm:
-            inStrm.write('Building {}'. format(house_num))
+    parser = argparse.ArgumentParser(description="recognise the house "+
+            "numbers in images")
+    parser.add_argument('--watch', metavar='DIRECTORY', help="keep "+
+            "recognising new images which are dropped into this directory")
+    parser.add_argument('--interval', type=float, default=1.0, help="seconds"+
+            " between each check of the watched directory")
+    parser.add_argument('--stdin', action='store_true', help="recognise the"+
+            " length prefixed images piped into the standard input")
+    parser.add_argument('--batch', type=int, default=64, help="the number "+
+            "of images which have their digits classified together")
+    parser.add_argument('--gray', action='store_true', help="classify the "+
+            "digits with a grayscale model, which is a third of the size")
+    parser.add_argument('--binarise', action='store_true', help="threshold "+
+            "each digit of the grayscale model into black and white")
+    parser.add_argument('--cascade', action='store_true', help="only "+
+            "classify the digits which a small PCA model isn't sure about "+
+            "with the full model")
+    args = parser.parse_args()
+
+    #the model is trainned by a background thread, so the digits of the
+    #first images can be extracted whilst the model is still been made
+    #the images are still loaded in colour to find the digits, and the
+    #trainner converts the digits to its own mode
+    settings = {
+        'train_path': trainning_path,
+        'val_path': test_path,
+        'mode': 'GRAY' if args.gray or args.binarise else 'BGR',
+        'binarise': args.binarise
+    }
+    #without the trainning images, the stored model is only read, hence it's
+    #read straight away so a model which can't be used is found before any
+    #image is processed
+    load = 'background' if os.path.exists(trainning_path) else 'eager'
+    try:
+        if args.cascade:
+            #both stages use the same feature store, hence the full model is
+            #only fitted once the first stage has made the store, and it's
+            #only needed for the first digit which the first stage isn't
+            #sure about
+            trainner = Cascade(Trainer(load=load, projection='pca',
+                components=20, **settings), Trainer(load='lazy', **settings))
+        else:
+            trainner = Trainer(load=load, **settings)
+    except StoreError as err:
+        message = err.mssg + "\n"
+        #the serilised files of the older versions only hold a BGR model
+        if settings['mode'] == 'GRAY':
+            message += "a grayscale model needs the trainning images: %s\n"\
+                    % trainning_path
+        parser.exit(1, message)
+
+    if args.watch is not None:
+        watch(trainner, args.watch, args.interval)
+    elif args.stdin:
+        #the images never touch the disk, they're decoded straight from the
+        #bytes read from the pipe
+        stream_images = Image_Loader(None, 'BGR', size_hint=Image.resize_limit)
+        for im_id, image in enumerate(stream_images.stream()):
+            recognise(trainner, image, im_id)
+    else:
+        #extracting the region of interest to the output file
+        #decoding the next few images whilst the current one is been segmented
+        #get_ROI shrinks large images anyway, so they can be decoded smaller
+        test_images = Image_Loader(test_path, 'BGR', prefetch=4,
+                size_hint=Image.resize_limit)
+
+        #im_id is needed so that we can save the files with a unique id but
+        #with the same starting string
+        recognise_batches(trainner, enumerate(test_images), args.batch)
@@ -19,10 +19,20 @@ Hello their (^ _^)/
             python3 -m unittest test_image
 
         -if the trainning data is different to the one which you have provided
-        us on blackboard, you will need to delte the binary files with the names
-        kNN_classfy, and kNN_lables so the algorithm can create new versions
-        of these files to clasfy
+        us on blackboard, you don't need to delete anything. The kNN_store
+        directory is made again by itself whenever the trainning images
+        change, and only the images which are new or changed are processed
 
         - also if you want to change directory on were to tet the image
         just jump into the main and change the test_path variable
+
+        - if you want the programme to keep recognising images as they're
+        dropped into a directory, run
+
+            python3 main.py --watch DIRECTORY
+
+        - if you want to see how fast, and how accurate the classifier is,
+        run this command which writes the results as JSON
+
+            python3 bench_Trainer.py ../Digits-2020S2/ --output bench.json
 "
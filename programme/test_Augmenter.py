@@ -0,0 +1,59 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE: to test the class of Augmenter to ensure that the same seed, and
+key always gives the same noise, and that every image of a batch gets
+different noise
+
+TO DO:
+"""
+
+import unittest
+import numpy as np
+import cv2 as cv
+from Augmenter import *
+
+class test_Augmenter(unittest.TestCase):
+    im = cv.imread('../Digits-2020S2/4/digit4-2.jpg')
+
+    def test_seed(self):
+        augmenter = Augmenter(seed=5)
+        first = augmenter.augment([self.im, self.im], [3, 'a#1'])
+        again = Augmenter(seed=5).augment([self.im, self.im], [3, 'a#1'])
+        for im_a, im_b in zip(first, again):
+            self.assertTrue(np.array_equal(im_a, im_b), "same seed, and key")
+
+        self.assertFalse(np.array_equal(first[0], first[1]), "each copy gets"+
+                " different noise")
+        other = Augmenter(seed=6).augment([self.im], [3])[0]
+        self.assertFalse(np.array_equal(first[0], other), "different seed")
+        other = augmenter.augment([self.im], [4])[0]
+        self.assertFalse(np.array_equal(first[0], other), "different key")
+
+        #the noise of an image doesn't depend on the rest of the batch
+        alone = augmenter.augment([self.im], ['a#1'])[0]
+        self.assertTrue(np.array_equal(first[1], alone), "same noise in a "+
+                "different batch")
+        unkeyed = augmenter.augment([self.im, self.im])
+        self.assertFalse(np.array_equal(unkeyed[0], unkeyed[1]), "each image"+
+                " gets different noise without keys")
+        unseeded = augmenter.augment([self.im, self.im], [None, None])
+        self.assertFalse(np.array_equal(unseeded[0], unseeded[1]), "new "+
+                "noise for a key of None")
+
+    def test_noise(self):
+        augmented = Augmenter((10, 10, 10), (5, 5, 5)).augment([self.im])[0]
+        self.assertEqual(self.im.shape, augmented.shape, "same shape")
+        self.assertEqual(np.uint8, augmented.dtype, "still an image")
+        diff = augmented.astype(np.float32) - self.im
+        #the pixels which aren't saturated get the mean of the noise
+        unsaturated = (self.im > 40) & (self.im < 215)
+        self.assertAlmostEqual(10, diff[unsaturated].mean(),
+                msg="mean of the noise", delta=0.5)
+
+        gray = cv.cvtColor(self.im, cv.COLOR_BGR2GRAY)
+        self.assertEqual(gray.shape, Augmenter().augment([gray])[0].shape,
+                "single channel images")
+        self.assertEqual([], Augmenter().augment([]), "empty batch")
+        self.assertRaises(ParameterError, Augmenter, copies=0)
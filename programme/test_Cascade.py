@@ -0,0 +1,102 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE: to test the class of Cascade to ensure that the confident digits
+are labelled by the first stage, and the other digits by the second stage
+
+TO DO:
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from Trainer import *
+from Cascade import *
+
+class test_Cascade(unittest.TestCase):
+    store_dir = tempfile.mkdtemp()
+    settings = {'train_path': '../Digits-2020S2/', 'val_path': None,
+            'mode': 'BGR', 'workers': 1,
+            'store_path': os.path.join(store_dir, 'kNN_store'),
+            'manifest_path': os.path.join(store_dir, 'Digits-2020S2.manifest')}
+    full = Trainer(**settings)
+    cheap = Trainer(projection='pca', components=16, **settings)
+    images = [cv.imread('../Digits-2020S2/%d/digit%d-%d.jpg' %
+        (ii % 10, ii % 10, 2 + ii // 10)) for ii in range(20)]
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.store_dir, ignore_errors=True)
+
+    def test_stages(self):
+        cheap_res = self.cheap.classify(self.images)[0]
+        full_res = self.full.classify(self.images)[0]
+
+        #a margin which can't be reached sends every digit to the full model
+        cascade = Cascade(self.cheap, self.full, min_margin=1.0, max_dist=-1)
+        result, dist = cascade.classify(self.images)
+        self.assertTrue(np.array_equal(full_res, result), "every digit is "+
+                "labelled by the full model")
+        self.assertEqual(20, cascade.stats['deferred'], "nothing accepted")
+
+        #no margin accepts every digit in the first stage
+        cascade = Cascade(self.cheap, self.full, min_margin=0.0)
+        result, dist = cascade.classify(self.images)
+        self.assertTrue(np.array_equal(cheap_res, result), "every digit is "+
+                "labelled by the first stage")
+        self.assertEqual(1.0, cascade.stats['accept_rate'], "all accepted")
+
+        cascade = Cascade(self.cheap, self.full, min_margin=0.75)
+        result, dist = cascade.classify(self.images)
+        self.assertEqual((20, 1), result.shape, "one label for each digit")
+        self.assertEqual((20, 8), dist.shape, "distance to each neighbour")
+        self.assertEqual(20, cascade.stats['accepted'] +
+                cascade.stats['deferred'], "every digit is counted")
+        for ii in range(20):
+            self.assertIn(result[ii, 0], (cheap_res[ii, 0], full_res[ii, 0]),
+                    "labelled by one of the stages")
+
+    def test_small_stage(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            #a first stage which has less trainning samples than k
+            train_path = os.path.join(tmp_dir, 'digits')
+            for label in ('0', '1'):
+                os.makedirs(os.path.join(train_path, label))
+                for ii in (1, 2):
+                    shutil.copy('../Digits-2020S2/%s/digit%s-%d.jpg' % (label,
+                        label, ii), os.path.join(train_path, label))
+            small = Trainer(train_path=train_path, val_path=None, mode='BGR',
+                    workers=1, store_path=os.path.join(tmp_dir, 'kNN_store'))
+
+            for min_margin, max_dist in ((1.0, -1), (0.0, None)):
+                cascade = Cascade(small, self.full, min_margin, max_dist)
+                result, dist = cascade.classify(self.images)
+                self.assertEqual((20, 8), dist.shape, "k distances for each"+
+                        " digit")
+                if max_dist is None:
+                    self.assertTrue(np.all(np.isinf(dist[:, 4:])), "the "+
+                            "neighbours which the first stage doesn't have")
+                else:
+                    self.assertTrue(np.allclose(self.full.classify(
+                        self.images)[1], dist), "every digit from the full "+
+                        "model")
+
+    def test_classify_many(self):
+        cascade = Cascade(self.cheap, self.full)
+        groups = [self.images[:5], [], self.images[5:]]
+        batched = cascade.classify_many(groups)
+        result = cascade.classify(self.images)[0]
+        self.assertTrue(np.array_equal(result, np.concatenate([res for res,
+            dist in batched])), "same labels as classifying them together")
+        self.assertEqual([5, 0, 15], [len(res) for res, dist in batched],
+                "split back into the groups")
+
+    def test_margin(self):
+        index = self.full.trainner
+        neighbours = np.array([[1, 1, 1, 1], [1, 1, 2, 2], [1, 1, 1, 3]],
+                dtype=np.float32)
+        self.assertEqual([1.0, 0.0, 0.5], index.margin(neighbours).tolist(),
+                "share of the winner less the share of the runner up")
+        self.assertRaises(ParameterError, Cascade, self.cheap, self.full, 2)
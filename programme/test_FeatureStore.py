@@ -0,0 +1,132 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE: to test the class of Feature_Store to ensure that the features, and
+the labels which are written to the disk are the same as the ones which are
+memory mapped back in
+
+TO DO:
+"""
+
+import os
+import unittest
+import tempfile
+import numpy as np
+from FeatureStore import *
+
+class test_FeatureStore(unittest.TestCase):
+    features = np.arange(4 * 3360, dtype=np.float32).reshape(4, 3360)
+    labels = np.array([0, 1, 2, 3], dtype=np.float32)
+
+    def test_write_open(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = Feature_Store(tmp_dir + '/store')
+            self.assertFalse(store.exists(), "nothing has been written yet")
+
+            store.write(self.features, self.labels, {'mode': 'BGR'})
+            self.assertTrue(store.exists(), "store exists after writing")
+
+            #opening with a new object, like a new process would
+            store = Feature_Store(tmp_dir + '/store')
+            features, labels = store.open()
+            self.assertEqual(np.memmap, type(features), "features are memory"+
+                    " mapped")
+            self.assertTrue(np.array_equal(self.features, features),
+                    "features are the same as the ones written")
+            self.assertTrue(np.array_equal(self.labels, labels),
+                    "labels are the same as the ones written")
+            self.assertEqual({'mode': 'BGR'}, store.metadata, "metadata is "+
+                    "kept in the header")
+            self.assertEqual(4, store.rows, "number of rows in the header")
+
+    def test_invalid(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = Feature_Store(tmp_dir)
+            with self.assertRaises(StoreError):
+                store.write(self.features, self.labels[:2])
+
+            store.write(self.features, self.labels)
+            #a store written by a different version can't be read
+            store.version = Feature_Store.version + 1
+            self.assertFalse(store.exists(), "different version")
+
+    def test_replace(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = Feature_Store(tmp_dir)
+            store.write(self.features, self.labels)
+
+            #the old header mustn't be seen with the new arrays
+            seen = []
+            replace = os.replace
+            def check_replace(src, dst):
+                if dst.endswith('.bin'):
+                    seen.append(Feature_Store(tmp_dir).exists())
+                replace(src, dst)
+            os.replace = check_replace
+            try:
+                store.write(self.features[:2], self.labels[:2])
+                features, labels = store.create(3, (3360,))
+                store.commit()
+            finally:
+                os.replace = replace
+
+            self.assertEqual([False] * 4, seen, "no store whilst the arrays"+
+                    " are replaced")
+            self.assertEqual(3, Feature_Store(tmp_dir).rows, "new header")
+
+    def test_extend(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = Feature_Store(tmp_dir)
+            store.write(self.features, self.labels, sources=['a', 'b', 'c',
+                'd'])
+            old_features = store.open()[0]
+
+            features, labels = store.extend(2)
+            self.assertEqual((6, 3360), features.shape, "two rows added")
+            features[4:] = 7
+            labels[4:] = 9
+            features.flush()
+            labels.flush()
+            #the new rows aren't seen until they're committed
+            self.assertEqual(4, Feature_Store(tmp_dir).rows, "not committed")
+            store.commit({'mode': 'BGR'}, ['a', 'b', 'c', 'd', 'e', 'f'])
+
+            store = Feature_Store(tmp_dir)
+            features, labels = store.open()
+            self.assertEqual(6, store.rows, "committed rows")
+            self.assertTrue(np.array_equal(self.features, features[:4]),
+                    "old rows are kept")
+            self.assertTrue(np.all(features[4:] == 7), "new rows")
+            self.assertEqual([9, 9], labels[4:].tolist(), "new labels")
+            self.assertEqual('f', store.sources[-1], "sources of the rows")
+            self.assertTrue(np.array_equal(self.features, old_features),
+                    "old readers can still read their rows")
+
+    def test_rewrite(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = Feature_Store(tmp_dir)
+            store.write(self.features, self.labels)
+            old_features, old_labels = Feature_Store(tmp_dir).open()
+
+            features, labels = store.extend(1, rewrite=True)
+            features[1] = -1
+            features[4] = 7
+            labels[1] = 5
+            features.flush()
+            labels.flush()
+            self.assertTrue(np.array_equal(self.features, Feature_Store(
+                tmp_dir).open()[0]), "not seen until committed")
+            store.commit()
+
+            #readers which mapped the store before keep their rows
+            self.assertTrue(np.array_equal(self.features, old_features),
+                    "old readers don't see the changed rows")
+            self.assertEqual(self.labels.tolist(), old_labels.tolist(),
+                    "old readers don't see the changed labels")
+            features, labels = Feature_Store(tmp_dir).open()
+            self.assertEqual(5, len(features), "new row")
+            self.assertTrue(np.all(features[1] == -1), "changed row")
+            self.assertEqual(5, labels[1], "changed label")
+            self.assertTrue(np.array_equal(self.features[2:], features[2:4]),
+                    "other rows are copied")
@@ -0,0 +1,45 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE: to test the feature extractors to ensure that each extractor makes
+the number of features which it says it will, in every mode
+
+TO DO:
+"""
+
+import unittest
+import numpy as np
+import cv2 as cv
+from Features import *
+
+class test_Features(unittest.TestCase):
+    size = (28, 40)
+    digit = cv.resize(cv.imread('../Digits-2020S2/7/digit7-2.jpg'), size)
+
+    def test_pixels(self):
+        pixels = Feature_Extractor.create('pixels', 'BGR', self.size)
+        self.assertEqual(28 * 40 * 3, pixels.length(), "three channels")
+        self.assertEqual(pixels.length(), pixels.extract(self.digit).size,
+                "one feature for each pixel")
+        gray = Feature_Extractor.create('pixels', 'GRAY', self.size)
+        self.assertEqual(28 * 40, gray.length(), "one channel")
+
+    def test_hog(self):
+        for mode, conversion in (('BGR', None), ('HSV', cv.COLOR_BGR2HSV),
+                ('GRAY', cv.COLOR_BGR2GRAY)):
+            digit = self.digit if conversion is None else \
+                    cv.cvtColor(self.digit, conversion)
+            hog = Feature_Extractor.create('hog', mode, self.size)
+            features = hog.extract(digit)
+            self.assertEqual(hog.length(), features.size, "%s features" % mode)
+            self.assertLessEqual(features.max(), hog.max_value, "largest "+
+                    "feature")
+
+        #a digit which isn't the size of the window is resized to it
+        hog = Feature_Extractor.create('hog', 'BGR', self.size)
+        self.assertEqual(hog.length(), hog.extract(cv.resize(self.digit,
+            (56, 80))).size, "resized to the window")
+
+        self.assertRaises(ParameterError, Feature_Extractor.create, 'sift',
+                'BGR', self.size)
@@ -0,0 +1,74 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE: to test the class of Image_Cache to ensure that the least recently
+used images are removed once the budget is reached, and that Image_Loader
+only decodes an image once when it has a cache
+
+TO DO:
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from ImageCache import *
+from ImageLoader import *
+
+class test_ImageCache(unittest.TestCase):
+    im = np.zeros((10, 10, 3), dtype=np.uint8)
+
+    def test_budget(self):
+        #room for two of the images
+        cache = Image_Cache(2 * self.im.nbytes)
+        cache.put('a', self.im.copy())
+        cache.put('b', self.im.copy())
+        self.assertIsNotNone(cache.get('a'), "a is cached")
+        #b is now the least recently used image
+        cache.put('c', self.im.copy())
+        self.assertNotIn('b', cache, "least recently used image is removed")
+        self.assertIn('a', cache, "recently used image is kept")
+        self.assertEqual(2 * self.im.nbytes, cache.size, "bytes in the cache")
+        self.assertEqual((1, 0), (cache.hits, cache.misses), "hit counter")
+
+        self.assertIsNone(cache.get('b'), "b was removed")
+        self.assertEqual(1, cache.misses, "miss counter")
+
+        #an image larger than the budget isn't cached
+        cache.put('d', np.zeros((100, 100, 3), dtype=np.uint8))
+        self.assertNotIn('d', cache, "image larger than the budget")
+
+        with self.assertRaises(ValueError):
+            cache.get('a')[0, 0] = 1
+
+        with self.assertRaises(ParameterError):
+            Image_Cache(0)
+
+    def test_loader(self):
+        cache = Image_Cache(10 * 1024 * 1024)
+        loader = Image_Loader('../train_updated/', 'GRAY', cache=cache)
+        first = list(loader)
+        self.assertEqual((0, len(loader)), (cache.hits, cache.misses),
+                "every image is decoded on the first pass")
+        second = list(loader)
+        self.assertEqual(len(loader), cache.hits, "no image is decoded on "+
+                "the second pass")
+        for im_one, im_two in zip(first, second):
+            self.assertIs(im_one, im_two, "same image from the cache")
+
+        #a different mode is a different image
+        loader.mode = 'BGR'
+        loader.load_image(loader.data[0])
+        self.assertEqual(len(loader) + 1, cache.misses, "mode is in the key")
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'digit.jpg')
+            shutil.copy('../Digits-2020S2/1/digit1-1.jpg', path)
+            loader.load_image(path)
+            #changing the image on the disk changes its modification time
+            shutil.copy('../Digits-2020S2/8/digit8-1.jpg', path)
+            os.utime(path, ns=(1, 1))
+            self.assertTrue(np.array_equal(cv.imread(path),
+                loader.load_image(path)), "changed image is decoded again")
@@ -10,6 +10,11 @@ TO DO:
     - Testing of invalid data for all mutators, accesors, and methods
 """
 import unittest
+import io
+import os
+import shutil
+import tempfile
+import numpy as np
 from ImageLoader import *
 
 class test_imageLoader(unittest.TestCase):
@@ -95,3 +100,237 @@ class test_imageLoader(unittest.TestCase):
                 " labels")
 
 
+    def test_prefetch(self):
+        """
+        PURPOSE: to test that decoding the images ahead of the consumer will
+        give back the same images in the same order as decoding them one at a
+        time
+        """
+        nw_path = '../Digits-2020S2/2/'
+        serial = Image_Loader(nw_path, 'BGR')
+        prefetched = Image_Loader(nw_path, 'BGR', prefetch=4)
+
+        with prefetched:
+            for ii in range(2):
+                #iterating twice to make sure the window is refilled
+                found = list(prefetched)
+                self.assertEqual(len(serial), len(found), "prefetching "+
+                        "returns every image in the directory")
+                for expected, im in zip(serial, found):
+                    self.assertTrue(np.array_equal(expected, im),
+                            "prefetching keeps the iteration order")
+
+        with self.assertRaises(ParameterError):
+            Image_Loader(nw_path, prefetch=-1)
+
+    def test_manifest(self):
+        """
+        PURPOSE: to test that the manifest will find every image inside of
+        the digit directories, label them by their directory, and that it
+        can be re-used on the next scan
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = os.path.join(tmp_dir, 'digits')
+            for label in ('0', '1'):
+                shutil.copytree('../Digits-2020S2/%s/' % label,
+                        os.path.join(root, label))
+            #files which aren't images should be ignored by the scan
+            with open(os.path.join(root, '0', 'notes.txt'), 'w') as outStrm:
+                outStrm.write('not an image')
+
+            loader = Image_Loader(root, 'BGR', manifest=True)
+            #13 zeros and 10 ones
+            self.assertEqual(23, len(loader), "manifest finds every image "+
+                    "recursively")
+            self.assertEqual(['0'] * 13 + ['1'] * 10, loader.labels,
+                    "images are labelled by their directory")
+            self.assertTrue(os.path.isfile(root + Manifest.suffix),
+                    "manifest is written next to the data set")
+
+            #adding a new image should only change the directory it's in
+            shutil.copy('../Digits-2020S2/1/digit1-1.jpg',
+                    os.path.join(root, '1', 'digit1-new.jpg'))
+            manifest = Manifest(root)
+            self.assertEqual(24, len(manifest.paths), "re-scanning finds "+
+                    "the new image")
+            self.assertEqual(manifest.paths, Manifest(root).paths,
+                    "an unchanged data set gives back the same manifest")
+
+            #writing over an image in place doesn't change its directory
+            changed = os.path.join(root, '0', 'digit0-1.jpg')
+            dir_mtime = os.stat(os.path.join(root, '0')).st_mtime_ns
+            with open(changed, 'ab') as outStrm:
+                outStrm.write(b'\0')
+            os.utime(os.path.join(root, '0'), ns=(dir_mtime, dir_mtime))
+            entry = [entry for entry in Manifest(root).entries
+                    if entry[0] == changed][0]
+            self.assertEqual(os.stat(changed).st_size, entry[1], "a file "+
+                    "changed in place is stat-ed again")
+
+            #images in the root of the data set don't have a label directory
+            shutil.copy(changed, os.path.join(root, 'unlabelled.jpg'))
+            self.assertEqual(24, len(Manifest(root).paths), "images in the"+
+                    " root are left out")
+
+            #the manifest can be kept somewhere else
+            manifest_path = os.path.join(tmp_dir, 'other.manifest')
+            loader = Image_Loader(root, 'BGR', manifest=manifest_path)
+            self.assertEqual(24, len(loader), "same images")
+            self.assertTrue(os.path.isfile(manifest_path), "manifest is "+
+                    "written to the given path")
+
+    def test_size_hint(self):
+        """
+        PURPOSE: to test that a large JPEG is decoded at a reduced size, which
+        is still larger than the size hint
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'large.jpg')
+            im = np.zeros((1900, 2000, 3), dtype=np.uint8)
+            cv.rectangle(im, (500, 500), (1500, 1400), (255, 255, 255), -1)
+            cv.imwrite(path, im)
+
+            loader = Image_Loader(path, 'BGR')
+            self.assertEqual((2000, 1900), loader.read_size(path),
+                    "size read from the JPEG header")
+            #a file which ends inside of the start of frame segment
+            with open(path, 'rb') as inStrm:
+                encoded = inStrm.read()
+            sof = encoded.index(b'\xff\xc0')
+            self.assertIsNone(loader.read_size(encoded[:sof + 7]),
+                    "truncated start of frame")
+            self.assertEqual((1900, 2000, 3), next(iter(loader)).shape,
+                    "no size hint decodes the full image")
+
+            loader.size_hint = (900, 900)
+            self.assertEqual((950, 1000, 3), next(iter(loader)).shape,
+                    "reduced by 2 as 4 would be smaller than the hint")
+
+            loader.size_hint = (400, 400)
+            self.assertEqual((475, 500, 3), next(iter(loader)).shape,
+                    "reduced by 4 as 8 would be smaller than the hint")
+
+        #PNGs aren't reduced, even though this one has a JPEG extension
+        png_path = '../Digits-2020S2/5/digit5-7.jpg'
+        self.assertIsNone(loader.read_size(png_path), "not a JPEG")
+
+    def test_batches(self):
+        """
+        PURPOSE: to test that the batches have a fixed shape, and they're the
+        same as resizing each image by itself
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            loader = Image_Loader('../Digits-2020S2/', 'BGR', manifest=
+                    os.path.join(tmp_dir, 'digits.manifest'), prefetch=2)
+            found = list(loader.batches(50, (28, 40)))
+        #132 digits in the data set
+        self.assertEqual([50, 50, 32], [len(batch[0]) for batch in found],
+                "the last batch has the rest of the images")
+        self.assertEqual((50, 40, 28, 3), found[0][0].shape, "batch shape")
+        self.assertEqual(np.uint8, found[0][0].dtype, "batch data type")
+
+        paths = sum([batch[1] for batch in found], [])
+        labels = sum([batch[2] for batch in found], [])
+        self.assertEqual(loader.data, paths, "paths of each batch")
+        self.assertEqual(loader.labels, labels, "labels of each batch")
+
+        expected = cv.resize(loader.load_image(paths[60]), (28, 40))
+        self.assertTrue(np.array_equal(expected, found[1][0][10]),
+                "resized into the batch")
+
+        loader.mode = 'GRAY'
+        batch = next(loader.batches(8, (14, 20)))[0]
+        self.assertEqual((8, 20, 14), batch.shape, "gray batches")
+
+        with self.assertRaises(ParameterError):
+            next(loader.batches(0, (28, 40)))
+
+    def test_mode_table(self):
+        """
+        PURPOSE: to test that decoding straight into a mode gives the same
+        image as decoding to BGR and then converting it
+        """
+        path = '../train_updated/tr03.jpg'
+        loader = Image_Loader(path, 'BGR')
+        bgr = loader.load_image(path)
+
+        conversions = {'HSV': cv.COLOR_BGR2HSV, 'LUV': cv.COLOR_BGR2Luv,
+                'LAB': cv.COLOR_BGR2Lab, 'RGB': cv.COLOR_BGR2RGB}
+        for mode, conversion in conversions.items():
+            loader.mode = mode
+            self.assertTrue(np.array_equal(cv.cvtColor(bgr, conversion),
+                loader.load_image(path)), "converted in place to %s" % mode)
+
+        loader.mode = 'GRAY'
+        gray = loader.load_image(path)
+        self.assertEqual(bgr.shape[:2], gray.shape, "gray has one channel")
+        #the JPEG decoder gives the luma channel straight from the file, which
+        #can be a few levels away from converting the decoded colours
+        diff = np.abs(gray.astype(int) - cv.cvtColor(bgr, cv.COLOR_BGR2GRAY))
+        self.assertLess(diff.mean(), 1.0, "decoded straight to gray")
+
+    def test_zip(self):
+        """
+        PURPOSE: to test that the images inside of a zip file are the same as
+        the images inside of the extracted directory
+        """
+        zipped = Image_Loader('../data/Digits-2020S2.zip', 'BGR', prefetch=2)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            extracted = Image_Loader('../Digits-2020S2/', 'BGR', manifest=
+                    os.path.join(tmp_dir, 'digits.manifest'))
+        self.assertEqual(len(extracted), len(zipped), "every image in the "+
+                "archive is found")
+        self.assertEqual(sorted(extracted.labels), sorted(zipped.labels),
+                "labels are made from the directories inside the archive")
+
+        images = dict(zip(zipped.data, zipped))
+        member = 'Digits-2020S2/7/digit7-3.jpg'
+        self.assertTrue(np.array_equal(
+            extracted.load_image('../' + member), images[member]),
+            "decoded from the archive")
+
+        #the archive is opened again after it has been closed
+        zipped.close()
+        self.assertEqual(len(zipped), len(list(zipped)), "re-opened archive")
+        zipped.close()
+
+    def test_memory_sources(self):
+        """
+        PURPOSE: to test that images can be decoded from bytes, file objects,
+        and length prefixed streams without been written to the disk
+        """
+        path = '../train_updated/tr03.jpg'
+        expected = Image_Loader(path, 'BGR').load_image(path)
+        with open(path, 'rb') as inStrm:
+            buf = inStrm.read()
+
+        from_bytes = Image_Loader(buf, 'BGR')
+        self.assertEqual(1, len(from_bytes), "one image in memory")
+        self.assertTrue(np.array_equal(expected, next(iter(from_bytes))),
+                "decoded from bytes")
+        self.assertEqual([None], from_bytes.labels, "no directory to label by")
+
+        with open(path, 'rb') as inStrm:
+            from_file = Image_Loader(inStrm, 'GRAY')
+        self.assertEqual(expected.shape[:2], next(iter(from_file)).shape,
+                "decoded from a file object")
+
+        stream = io.BytesIO()
+        loader = Image_Loader(None, 'BGR')
+        self.assertEqual(0, len(loader), "no images without a path")
+        for ii in range(3):
+            loader.write_frame(stream, buf)
+        stream.seek(0)
+        images = list(loader.stream(stream))
+        self.assertEqual(3, len(images), "every image in the stream")
+        self.assertTrue(np.array_equal(expected, images[2]),
+                "decoded from the stream")
+
+        #a stream which is cut off part way through an image
+        stream = io.BytesIO(stream.getvalue()[:-10])
+        with self.assertRaises(ImageError):
+            list(loader.stream(stream))
+
+        with self.assertRaises(ImageError):
+            loader.load_image(b'not an image')
+
@@ -0,0 +1,130 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE: to test the nearest neighbour indexes to ensure that the exact
+indexes agree with the kNN classifier of OpenCV, and that the approximate
+index finds most of the true neighbours
+
+TO DO:
+"""
+
+import os
+import tempfile
+import unittest
+import numpy as np
+from Index import *
+
+class test_Index(unittest.TestCase):
+    #clusters of samples around a centre for each label, like the digits
+    rng = np.random.default_rng(7)
+    centres = rng.uniform(0, 255, (10, 64)).astype(np.float32)
+    labels = np.repeat(np.arange(10), 40).astype(np.float32)
+    samples = (centres[labels.astype(int)] +
+            rng.normal(0, 30, (400, 64))).astype(np.float32)
+    queries = (centres[np.arange(50) % 10] +
+            rng.normal(0, 30, (50, 64))).astype(np.float32)
+
+    def test_vote(self):
+        index = Index.create('lsh')
+        #a tie is given to the smallest label, like the kNN classifier
+        neighbours = np.array([[5, 3], [3, 7], [7, 3], [1, 1]],
+                dtype=np.float32)
+        self.assertEqual([3, 3, 3, 1], index.vote(neighbours).ravel().tolist(),
+                "majority vote, with ties to the smallest label")
+
+    def test_exact(self):
+        brute = Index.create('brute')
+        brute.train(self.samples, self.labels)
+        ret, results, neighbours, dists = brute.find_nearest(self.queries, 5)
+
+        #checking every tree leaf, so the kd-tree search is exact
+        tree = Index.create('kdtree', checks=-1)
+        tree.train(self.samples, self.labels)
+        tree_res = tree.find_nearest(self.queries, 5)
+        self.assertTrue(np.array_equal(results, tree_res[1]), "kd-tree votes"+
+                " the same as brute force")
+        self.assertTrue(np.allclose(dists, tree_res[3], rtol=1e-4),
+                "kd-tree distances are squared L2 distances")
+
+        #voting in the index is the same as voting in the kNN classifier
+        self.assertTrue(np.array_equal(results, brute.vote(neighbours)),
+                "vote is the same as the kNN classifier")
+
+    def test_compact(self):
+        brute = Index.create('brute')
+        brute.train(self.samples, self.labels)
+        ret, results, neighbours, dists = brute.find_nearest(self.queries, 5)
+
+        #compact samples are searched in chunks, without the kNN classifier
+        compact = Index.create('brute')
+        compact.chunk_rows = 64
+        compact.train(self.samples.astype(np.float16), self.labels)
+        compact_res = compact.find_nearest(self.queries, 5)
+        self.assertTrue(np.array_equal(results, compact_res[1]), "same votes"+
+                " from the compact samples")
+        self.assertTrue(np.allclose(dists, compact_res[3], rtol=1e-2),
+                "distances computed in float32")
+        self.assertLess(compact.memory(), brute.memory(), "less memory")
+
+    def test_sharded(self):
+        brute = Index.create('brute')
+        brute.train(self.samples, self.labels)
+        ret, results, neighbours, dists = brute.find_nearest(self.queries, 5)
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            #the samples of the feature store are already memory mapped
+            file_name = os.path.join(tmp_dir, 'features.bin')
+            self.samples.astype(np.uint8).tofile(file_name)
+            mapped = np.memmap(file_name, dtype=np.uint8, mode='r',
+                    shape=self.samples.shape)
+            compact = Index.create('brute')
+            compact.train(mapped, self.labels)
+            compact_res = compact.find_nearest(self.queries, 5)
+
+            for samples, expected in ((self.samples, (results, dists)),
+                    (mapped, (compact_res[1], compact_res[3]))):
+                sharded = Index.create('sharded', workers=3)
+                sharded.chunk_rows = 50
+                try:
+                    sharded.train(samples, self.labels)
+                    self.assertEqual(3, len(sharded._shards), "a shard for "+
+                            "each worker")
+                    #the feature store is made again before the first search
+                    np.zeros((10, 64), dtype=np.uint8).tofile(file_name +
+                            '.tmp')
+                    os.replace(file_name + '.tmp', file_name)
+                    sharded_res = sharded.find_nearest(self.queries, 5)
+                finally:
+                    sharded.close()
+                self.assertTrue(np.array_equal(expected[0], sharded_res[1]),
+                        "same votes as a single search")
+                self.assertTrue(np.allclose(expected[1], sharded_res[3],
+                    rtol=1e-4), "same distances as a single search")
+
+    def test_lsh_recall(self):
+        brute = Index.create('brute')
+        brute.train(self.samples, self.labels)
+        dists = brute.find_nearest(self.queries, 5)[3]
+
+        lsh = Index.create('lsh', tables=8, bits=6, probes=2)
+        lsh.train(self.samples, self.labels)
+        ret, results, neighbours, lsh_dists = lsh.find_nearest(self.queries, 5)
+        #the approximate neighbours can only be further away
+        self.assertTrue(np.all(lsh_dists[:, 0] >= dists[:, 0] * (1 - 1e-4)),
+                "lsh never finds a closer neighbour than brute force")
+        recall = np.mean(np.isclose(lsh_dists, dists, rtol=1e-4))
+        self.assertGreater(recall, 0.8, "lsh finds most of the neighbours")
+
+    def test_stats(self):
+        for name in ('brute', 'kdtree', 'lsh'):
+            index = Index.create(name)
+            index.train(self.samples, self.labels)
+            index.find_nearest(self.queries, 3)
+            stats = index.stats
+            self.assertEqual(name, stats['backend'], "name of the backend")
+            self.assertEqual(50, stats['queries'], "number of samples queried")
+            self.assertGreater(stats['memory'], 0, "memory of the index")
+            self.assertGreaterEqual(stats['query_latency'], 0, "latency")
+
+        self.assertRaises(ParameterError, Index.create, 'octree')
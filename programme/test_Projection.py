@@ -0,0 +1,59 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE: to test the class of Projection to ensure that the features are
+projected down to the number of components, and that a saved projection is
+only loaded back for the same features
+
+TO DO:
+"""
+
+import unittest
+import tempfile
+import numpy as np
+from Projection import *
+
+class test_Projection(unittest.TestCase):
+    rng = np.random.default_rng(3)
+    #features which only vary in a few directions
+    features = (rng.normal(0, 1, (200, 5)) @ rng.normal(0, 10, (5, 300)) +
+            100).astype(np.float32)
+
+    def test_pca(self):
+        projection = Projection('pca', 5).fit(self.features)
+        projected = projection.transform(self.features)
+        self.assertEqual((200, 5), projected.shape, "one column per component")
+
+        #five components keep all of the distances between the features
+        full = np.sum((self.features[0] - self.features[1:]) ** 2, axis=1)
+        reduced = np.sum((projected[0] - projected[1:]) ** 2, axis=1)
+        self.assertTrue(np.allclose(full, reduced, rtol=1e-2), "distances are"+
+                " kept")
+
+    def test_random(self):
+        projection = Projection('random', 50, seed=1).fit(self.features)
+        self.assertEqual((200, 50), projection.transform(self.features).shape,
+                "one column per component")
+        other = Projection('random', 50, seed=1).fit(self.features)
+        self.assertTrue(np.array_equal(projection.transform(self.features),
+            other.transform(self.features)), "same seed, same projection")
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            projection = Projection('pca', 5).fit(self.features, 'abc')
+            projection.save(tmp_dir)
+
+            loaded = Projection('pca', 5)
+            self.assertTrue(loaded.load(tmp_dir, 'abc'), "same features")
+            self.assertTrue(np.allclose(projection.transform(self.features),
+                loaded.transform(self.features)), "same projection")
+            self.assertFalse(Projection('pca', 5).load(tmp_dir, 'xyz'),
+                    "different features")
+            self.assertFalse(Projection('pca', 6).load(tmp_dir, 'abc'),
+                    "different number of components")
+
+        self.assertRaises(ParameterError, Projection, 'ica')
+        self.assertRaises(ParameterError, Projection, 'pca', 0)
+        self.assertRaises(ParameterError, Projection('pca').transform,
+                self.features)
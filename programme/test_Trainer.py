@@ -2,21 +2,32 @@
 AUTHOR: Tawana Kwaramba: 19476700
 LAST EDITED:
 
-PURPOSE: to  test the class of DataSet to enusre that the functionality
+PURPOSE: to  test the class of Trainer to enusre that the functionality
 meets the expected functionality
 
 TO DO:
 """
 
+import shutil
+import tempfile
 import unittest
 from Trainer import *
-from DataSet import *
 
 class test_Trainer(unittest.TestCase):
     train_path = '../Digits-2020S2/'
     val_path = '../val_updated/'
 
-    test = Trainer(train_path=train_path, val_path=val_path)
+    #keeping the feature store, and the manifest out of the repository, so
+    #the tests always build the store from the trainning images
+    store_dir = tempfile.mkdtemp()
+    manifest_path = os.path.join(store_dir, 'Digits-2020S2.manifest')
+    test = Trainer(train_path=train_path, val_path=val_path, mode='BGR',
+            store_path=os.path.join(store_dir, 'kNN_store'), workers=1,
+            manifest_path=manifest_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.store_dir, ignore_errors=True)
 
 #    def test_accessors(self):
 #        #ensuring that all the accessors return the correct type
@@ -57,5 +68,432 @@ class test_Trainer(unittest.TestCase):
 #        cv.destroyAllWindows()
 
     def test_trainner(self):
-        pass
+        #one image of each digit from the trainning set
+        images = [cv.imread('../Digits-2020S2/%d/digit%d-2.jpg' % (ii, ii))
+                for ii in range(10)]
+        result, dist = self.test.classify(images)
+        self.assertEqual((10, 1), result.shape, "one label for each image")
+        self.assertEqual((10, 8), dist.shape, "distance to each neighbour")
+
+    def test_parallel_build(self):
+        #the features should be the same regardless of the number of
+        #processes which build them
+        store = Feature_Store(os.path.join(self.store_dir, 'kNN_store'))
+        serial = np.array(store.open()[0])
+
+        parallel_path = os.path.join(self.store_dir, 'parallel')
+        Trainer(train_path=self.train_path, val_path=self.val_path,
+                mode='BGR', store_path=parallel_path, workers=2,
+                manifest_path=self.manifest_path)
+        features, labels = Feature_Store(parallel_path).open()
+        self.assertEqual((132, 28 * 40 * 3), features.shape, "one row for "+
+                "each trainning image")
+        self.assertTrue(np.array_equal(serial, features), "same features "+
+                "from a process pool")
+        self.assertEqual(list(range(10)), sorted(set(labels.tolist())),
+                "every digit is labelled")
+
+        #the process pool is started from the background thread as well
+        background_path = os.path.join(self.store_dir, 'background')
+        trainer = Trainer(train_path=self.train_path, val_path=self.val_path,
+                mode='BGR', store_path=background_path, workers=2,
+                manifest_path=self.manifest_path, load='background')
+        trainer.wait()
+        self.assertTrue(np.array_equal(serial, Feature_Store(
+            background_path).open()[0]), "same features from the background")
+
+        #a store can't be made without any trainning images
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            os.makedirs(os.path.join(tmp_dir, 'digits', '0'))
+            self.assertRaises(PathError, Trainer, train_path=os.path.join(
+                tmp_dir, 'digits'), val_path=None, mode='BGR', store_path=
+                os.path.join(tmp_dir, 'kNN_store'), workers=1)
+
+
+    def test_update(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            train_path = os.path.join(tmp_dir, 'digits')
+            for label in ('0', '1', '2'):
+                shutil.copytree('../Digits-2020S2/%s/' % label,
+                        os.path.join(train_path, label))
+            store_path = os.path.join(tmp_dir, 'kNN_store')
+            trainer = Trainer(train_path=train_path, val_path=None,
+                    mode='BGR', store_path=store_path, workers=1)
+            store = Feature_Store(store_path)
+            #13 zeros, 10 ones, and 30 twos
+            self.assertEqual(53, store.rows, "one row for each image")
+            self.assertEqual((0, 0, 0), trainer.update(), "nothing changed")
+
+            #adding a new image, and changing an image in place
+            shutil.copy('../Digits-2020S2/1/digit1-1.jpg',
+                    os.path.join(train_path, '1', 'digit1-new.jpg'))
+            changed = os.path.join(train_path, '2', 'digit2-1.jpg')
+            shutil.copy('../Digits-2020S2/2/digit2-2.jpg', changed)
+            os.utime(changed, ns=(1, 1))
+            old_features = np.array(store.open()[0])
+
+            self.assertEqual((1, 1, 0), trainer.update(), "one new image, and"+
+                    " one changed image")
+            store = Feature_Store(store_path)
+            features, labels = store.open()
+            self.assertEqual(54, store.rows, "new image is appended")
+            self.assertEqual(1.0, labels[-1], "new image is labelled")
+            self.assertEqual(os.path.join('1', 'digit1-new.jpg'),
+                    store.sources[-1][0], "source of the new row")
+
+            row = [source[0] for source in store.sources].index(
+                    os.path.join('2', 'digit2-1.jpg'))
+            self.assertFalse(np.array_equal(old_features[row], features[row]),
+                    "changed image is pre-processed again")
+            unchanged = [ii for ii in range(53) if ii != row]
+            self.assertTrue(np.array_equal(old_features[unchanged],
+                features[unchanged]), "other rows are left alone")
+            self.assertEqual((0, 0, 0), trainer.update(), "up to date")
+
+            #removing an image makes the store again
+            os.remove(os.path.join(train_path, '0', 'digit0-1.jpg'))
+            self.assertEqual((0, 0, 1), trainer.update(), "one removed image")
+            self.assertEqual(53, Feature_Store(store_path).rows, "removed row")
+            result = trainer.classify([cv.imread(changed)])[0]
+            self.assertEqual(2.0, result[0][0], "model is fitted again")
+
+    def test_fingerprint(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            train_path = os.path.join(tmp_dir, 'digits')
+            for label in ('3', '4'):
+                shutil.copytree('../Digits-2020S2/%s/' % label,
+                        os.path.join(train_path, label))
+            store_path = os.path.join(tmp_dir, 'kNN_store')
+            Trainer(train_path=train_path, val_path=None, mode='BGR',
+                    store_path=store_path, workers=1)
+            fingerprint = Feature_Store(store_path).metadata
+            self.assertEqual('BGR', fingerprint['params']['mode'],
+                    "parameters are kept in the store")
+
+            #nothing has changed, so the store is read as it is
+            Trainer(train_path=train_path + '/', val_path=None, mode='BGR',
+                    store_path=store_path, workers=1)
+            self.assertEqual(fingerprint, Feature_Store(store_path).metadata,
+                    "same fingerprint regardless of how the path is written")
+
+            #a new image changes the data set, but not the parameters
+            shutil.copy('../Digits-2020S2/3/digit3-1.jpg',
+                    os.path.join(train_path, '4', 'digit4-new.jpg'))
+            Trainer(train_path=train_path, val_path=None, mode='BGR',
+                    store_path=store_path, workers=1)
+            store = Feature_Store(store_path)
+            self.assertNotEqual(fingerprint['dataset'],
+                    store.metadata['dataset'], "data set hash has changed")
+            self.assertEqual(os.path.join('4', 'digit4-new.jpg'),
+                    store.sources[-1][0], "new image appended, not rebuilt")
+
+            #an image written over in place doesn't change its directory
+            dataset = store.metadata['dataset']
+            old_features = np.array(store.open()[0])
+            label_dir = os.path.join(train_path, '3')
+            dir_mtime = os.stat(label_dir).st_mtime_ns
+            shutil.copy('../Digits-2020S2/8/digit8-2.jpg',
+                    os.path.join(label_dir, 'digit3-1.jpg'))
+            os.utime(label_dir, ns=(dir_mtime, dir_mtime))
+            Trainer(train_path=train_path, val_path=None, mode='BGR',
+                    store_path=store_path, workers=1)
+            store = Feature_Store(store_path)
+            self.assertNotEqual(dataset, store.metadata['dataset'], "image "+
+                    "changed in place is found when the trainner is made")
+            row = [source[0] for source in store.sources].index(
+                    os.path.join('3', 'digit3-1.jpg'))
+            self.assertFalse(np.array_equal(old_features[row],
+                store.open()[0][row]), "changed image is pre-processed again")
+
+            #a different mode makes the store again
+            Trainer(train_path=train_path, val_path=None, mode='HSV',
+                    store_path=store_path, workers=1)
+            store = Feature_Store(store_path)
+            self.assertEqual('HSV', store.metadata['params']['mode'],
+                    "store made again for a new mode")
+            self.assertEqual(os.path.join('3', 'digit3-1.jpg'),
+                    store.sources[0][0], "rebuilt in the order of the scan")
+
+    def test_no_trainning_images(self):
+        images = [cv.imread('../Digits-2020S2/%d/digit%d-2.jpg' % (ii, ii))
+                for ii in range(10)]
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            missing = os.path.join(tmp_dir, 'missing')
+            store_path = os.path.join(tmp_dir, 'kNN_store')
+            #the old serilised files are read for a BGR pixel model
+            for name in ('kNN_classfier', 'kNN_labels'):
+                shutil.copy(name, os.path.join(tmp_dir, name))
+            trainer = Trainer(train_path=missing, val_path=None, mode='BGR',
+                    store_path=store_path)
+            self.assertEqual((10, 1), trainer.classify(images)[0].shape,
+                    "serilised files are used")
+            for extra in ({'mode': 'GRAY'}, {'storage': 'uint8'},
+                    {'features': 'hog'}, {'projection': 'pca'}):
+                self.assertRaises(StoreError, Trainer, train_path=missing,
+                        val_path=None, store_path=store_path,
+                        **dict({'mode': 'BGR'}, **extra))
+
+            #the store is only read if it was made in the same way
+            shutil.copytree(os.path.join(self.store_dir, 'kNN_store'),
+                    store_path)
+            trainer = Trainer(train_path=missing, val_path=None, mode='BGR',
+                    store_path=store_path)
+            self.assertTrue(np.array_equal(self.test.classify(images)[0],
+                trainer.classify(images)[0]), "store is used")
+            for extra in ({'mode': 'GRAY'}, {'storage': 'float16'}):
+                self.assertRaises(StoreError, Trainer, train_path=missing,
+                        val_path=None, store_path=store_path,
+                        **dict({'mode': 'BGR'}, **extra))
+
+    def test_projection(self):
+        store_path = os.path.join(self.store_dir, 'kNN_store')
+        images = [cv.imread('../Digits-2020S2/%d/digit%d-2.jpg' % (ii, ii))
+                for ii in range(10)]
+        full = self.test.classify(images)[0]
+
+        trainer = Trainer(train_path=self.train_path, val_path=self.val_path,
+                mode='BGR', store_path=store_path, workers=1,
+                projection='pca', components=40,
+                manifest_path=self.manifest_path)
+        self.assertTrue(os.path.isfile(os.path.join(store_path,
+            Projection.file_name)), "projection is saved with the store")
+        self.assertLess(trainer.index_stats['memory'] * 20,
+                self.test.index_stats['memory'], "smaller trainning matrix")
+        result, dist = trainer.classify(images)
+        self.assertEqual((10, 1), result.shape, "one label for each image")
+        self.assertGreaterEqual(np.mean(result == full), 0.8, "mostly the"+
+                " same labels as the full features")
+
+        #the saved projection is used, as the store hasn't changed
+        again = Trainer(train_path=self.train_path, val_path=self.val_path,
+                mode='BGR', store_path=store_path, workers=1,
+                projection='pca', components=40,
+                manifest_path=self.manifest_path)
+        self.assertEqual(trainer.projection.key, again.projection.key,
+                "projection fitted on the same features")
+        self.assertTrue(np.array_equal(result, again.classify(images)[0]),
+                "same labels from the saved projection")
+
+    def test_storage(self):
+        images = [cv.imread('../Digits-2020S2/%d/digit%d-2.jpg' % (ii, ii))
+                for ii in range(10)]
+        full = np.array(Feature_Store(os.path.join(self.store_dir,
+            'kNN_store')).open()[0])
+        result, dist = self.test.classify(images)
+
+        for storage, dtype, scale in (('uint8', np.uint8, 1.0),
+                ('float16', np.float16, 1.0 / 255)):
+            store_path = os.path.join(self.store_dir, storage)
+            trainer = Trainer(train_path=self.train_path,
+                    val_path=self.val_path, mode='BGR', store_path=store_path,
+                    workers=1, storage=storage,
+                    manifest_path=self.manifest_path)
+            features = Feature_Store(store_path).open()[0]
+            self.assertEqual(dtype, features.dtype, "compact features")
+            self.assertTrue(np.allclose(full * scale, features, atol=1e-3),
+                    "same features, on the stored scale")
+            self.assertLess(trainer.index_stats['memory'] * 1.9,
+                    self.test.index_stats['memory'], "smaller index")
+
+            compact_result, compact_dist = trainer.classify(images)
+            self.assertTrue(np.array_equal(result, compact_result),
+                    "same labels as the float32 features")
+            self.assertTrue(np.allclose(dist * scale ** 2, compact_dist,
+                rtol=1e-2), "distances on the stored scale")
+
+        self.assertRaises(ParameterError, Trainer, train_path=self.train_path,
+                val_path=self.val_path, mode='BGR', storage='int4')
+
+    def test_features(self):
+        images = [cv.imread('../Digits-2020S2/%d/digit%d-2.jpg' % (ii, ii))
+                for ii in range(10)]
+        store_path = os.path.join(self.store_dir, 'hog')
+        trainer = Trainer(train_path=self.train_path, val_path=self.val_path,
+                mode='BGR', store_path=store_path, workers=1, features='hog',
+                manifest_path=self.manifest_path)
+        store = Feature_Store(store_path)
+        self.assertEqual('hog', store.metadata['params']['features'],
+                "feature extractor is kept in the store")
+        self.assertEqual(trainer.extractor.length(), store.open()[0].shape[1],
+                "one column for each feature")
+        self.assertLess(trainer.extractor.length() * 10,
+                self.test.extractor.length(), "far less features than pixels")
+
+        result, dist = trainer.classify(images)
+        self.assertGreaterEqual(np.mean(result.ravel() == np.arange(10)), 0.8,
+                "trainning digits are mostly recognised")
+        self.assertEqual('pixels', Feature_Store(os.path.join(self.store_dir,
+            'kNN_store')).metadata['params']['features'], "pixels by defualt")
+
+    def test_augmentation(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            train_path = os.path.join(tmp_dir, 'digits')
+            for label in ('5', '6'):
+                shutil.copytree('../Digits-2020S2/%s/' % label,
+                        os.path.join(train_path, label))
+            rows = len(Image_Loader(train_path, 'BGR', manifest=True).data)
+            store_path = os.path.join(tmp_dir, 'kNN_store')
+            Trainer(train_path=train_path, val_path=None, mode='BGR',
+                    store_path=store_path, workers=1, copies=3, seed=1)
+            store = Feature_Store(store_path)
+            features = np.array(store.open()[0])
+            self.assertEqual(rows * 3, store.rows, "three copies of each image")
+            self.assertEqual(store.sources[0][0] + '#2', store.sources[2][0],
+                    "each copy is its own source")
+            self.assertFalse(np.array_equal(features[0], features[1]),
+                    "each copy gets different noise")
+            self.assertEqual(1, store.metadata['params']['seed'], "seed is a"+
+                    " part of the parameters")
+
+            #the same seed reads the store, rather than augmenting again
+            Trainer(train_path=train_path, val_path=None, mode='BGR',
+                    store_path=store_path, workers=2, copies=3, seed=1)
+            fingerprint = store.metadata['fingerprint']
+            self.assertEqual(fingerprint, Feature_Store(store_path).metadata[
+                'fingerprint'], "store is reused")
+
+            #building from scratch gives the same features
+            shutil.rmtree(store_path)
+            Trainer(train_path=train_path, val_path=None, mode='BGR',
+                    store_path=store_path, workers=2, copies=3, seed=1)
+            self.assertTrue(np.array_equal(features,
+                Feature_Store(store_path).open()[0]), "reproducible rebuild")
+
+            Trainer(train_path=train_path, val_path=None, mode='BGR',
+                    store_path=store_path, workers=1, copies=3, seed=2)
+            self.assertFalse(np.array_equal(features,
+                Feature_Store(store_path).open()[0]), "different seed")
+
+            #updating the store gives the same rows as building it again,
+            #even though the new image is in the middle of a chunk
+            shutil.copy('../Digits-2020S2/5/digit5-1.jpg',
+                    os.path.join(train_path, '5', 'digit5-0.jpg'))
+            trainer = Trainer(train_path=train_path, val_path=None,
+                    mode='BGR', store_path=store_path, workers=1, copies=3,
+                    seed=2, load='lazy')
+            trainer.update()
+            store = Feature_Store(store_path)
+            updated = dict(zip([source[0] for source in store.sources],
+                np.array(store.open()[0])))
+            shutil.rmtree(store_path)
+            Trainer(train_path=train_path, val_path=None, mode='BGR',
+                    store_path=store_path, workers=1, copies=3, seed=2)
+            store = Feature_Store(store_path)
+            self.assertEqual(sorted(updated), sorted(source[0] for source in
+                store.sources), "same rows")
+            for source, row in zip(store.sources, store.open()[0]):
+                self.assertTrue(np.array_equal(updated[source[0]], row),
+                        "same features as a rebuild: %s" % source[0])
+
+    def test_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            train_path = os.path.join(tmp_dir, 'digits')
+            shutil.copytree('../Digits-2020S2/8/', os.path.join(train_path,
+                '8'))
+            image = cv.imread(os.path.join(train_path, '8', 'digit8-2.jpg'))
+            store_path = os.path.join(tmp_dir, 'kNN_store')
+
+            lazy = Trainer(train_path=train_path, val_path=None, mode='BGR',
+                    store_path=store_path, workers=1, load='lazy')
+            self.assertFalse(lazy.ready, "nothing is trainned yet")
+            self.assertFalse(Feature_Store(store_path).exists(), "the store"+
+                    " isn't made until it's needed")
+            self.assertEqual(8.0, lazy.classify([image], k=1)[0][0][0],
+                    "trainned on the first classification")
+            self.assertTrue(lazy.ready, "model is kept")
+
+            background = Trainer(train_path=train_path, val_path=None,
+                    mode='BGR', store_path=store_path, workers=1,
+                    load='background')
+            self.assertEqual(8.0, background.classify([image], k=1)[0][0][0],
+                    "waits for the background thread")
+            self.assertTrue(background.ready, "trainned in the background")
+
+            #two trainners of a new store don't make the store at once
+            shared_path = os.path.join(tmp_dir, 'shared_store')
+            first, second = [Trainer(train_path=train_path, val_path=None,
+                mode='BGR', store_path=shared_path, workers=1,
+                load='background', **extra) for extra in ({},
+                    {'projection': 'pca', 'components': 4})]
+            for trainer in (first, second):
+                self.assertEqual(8.0, trainer.classify([image], k=1)[0][0][0],
+                        "both trainners share the store")
+
+            #an exception in the background thread is raised when the model
+            #is needed
+            missing = Trainer(train_path=os.path.join(tmp_dir, 'missing'),
+                    val_path=None, mode='BGR', store_path=os.path.join(
+                        tmp_dir, 'missing_store'), load='background')
+            self.assertRaises(PathError, missing.classify, [image])
+
+        self.assertRaises(ParameterError, Trainer, train_path=self.train_path,
+                val_path=self.val_path, mode='BGR', load='later')
+
+    def test_classify_many(self):
+        images = [cv.imread('../Digits-2020S2/%d/digit%d-2.jpg' % (ii, ii))
+                for ii in range(10)]
+        groups = [images[:3], [], images[3:4], images[4:]]
+        batched = self.test.classify_many(groups)
+        self.assertEqual(len(groups), len(batched), "one result per group")
+        for group, (result, dist) in zip(groups, batched):
+            self.assertEqual((len(group), 1), result.shape, "one label for "+
+                    "each digit of the group")
+            if group:
+                single, single_dist = self.test.classify(group)
+                self.assertTrue(np.array_equal(single, result), "same labels"+
+                        " as classifying the group by itself")
+                self.assertTrue(np.allclose(single_dist, dist), "same "+
+                        "distances as classifying the group by itself")
+        self.assertEqual(2, len(self.test.classify_many([[], []])), "no digits")
+
+    def test_classify_ks(self):
+        images = [cv.imread('../Digits-2020S2/%d/digit%d-%d.jpg' %
+            (ii % 10, ii % 10, 2 + ii // 10)) for ii in range(20)]
+        labels = [ii % 10 for ii in range(20)]
+        results, dist, accuracy = self.test.classify_ks(images, range(1, 16),
+                labels)
+        self.assertEqual(list(range(1, 16)), sorted(results), "every k")
+        self.assertEqual((20, 15), dist.shape, "searched once for k of 15")
+        for k in (1, 4, 8, 15):
+            single = self.test.classify(images, k)[0]
+            self.assertTrue(np.array_equal(single, results[k]), "same as "+
+                    "classifying with k of %d" % k)
+            self.assertAlmostEqual(np.mean(single.ravel() == labels),
+                    accuracy[k], msg="accuracy with k of %d" % k)
+
+        self.assertIsNone(self.test.classify_ks(images, [3])[2], "no labels")
+        self.assertRaises(ParameterError, self.test.classify_ks, images, [0])
+
+    def test_gray(self):
+        images = [cv.imread('../Digits-2020S2/%d/digit%d-2.jpg' % (ii, ii))
+                for ii in range(10)]
+        self.assertEqual((46, 34), Image.pad_image(None, cv.cvtColor(
+            images[0], cv.COLOR_BGR2GRAY)).shape, "grayscale images are padded")
+
+        for binarise in (False, True):
+            store_path = os.path.join(self.store_dir, 'gray%d' % binarise)
+            trainer = Trainer(train_path=self.train_path,
+                    val_path=self.val_path, mode='GRAY', store_path=store_path,
+                    workers=1, binarise=binarise,
+                    manifest_path=self.manifest_path)
+            store = Feature_Store(store_path)
+            features = store.open()[0]
+            self.assertEqual(28 * 40, features.shape[1], "one channel")
+            self.assertEqual('GRAY', store.metadata['params']['mode'],
+                    "mode is kept in the store")
+            self.assertEqual(binarise, store.metadata['params']['binarise'],
+                    "binarise is kept in the store")
+            if binarise:
+                self.assertEqual([0.0, 255.0], np.unique(features).tolist(),
+                        "black and white digits")
+
+            #the digits cropped out of an image are in colour
+            result, dist = trainer.classify(images)
+            self.assertEqual((10, 1), result.shape, "colour digits are "+
+                    "converted to grayscale")
+            gray = [cv.cvtColor(im, cv.COLOR_BGR2GRAY) for im in images]
+            self.assertTrue(np.array_equal(result, trainer.classify(gray)[0]),
+                    "same labels for grayscale digits")
 
+        self.assertRaises(ParameterError, Trainer, train_path=self.train_path,
+                val_path=self.val_path, mode='BGR', binarise=True)
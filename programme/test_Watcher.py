@@ -0,0 +1,60 @@
+"""
+AUTHOR: Tawana Kwaramba: 19476700
+LAST EDITED:
+
+PURPOSE: to test the class of Watch_Folder to ensure that new images are only
+processed once they've finished been written, and that they're not processed
+again after a restart
+
+TO DO:
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from Watcher import *
+
+class test_Watcher(unittest.TestCase):
+    im_path = '../Digits-2020S2/3/digit3-1.jpg'
+
+    def test_poll(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            seen = []
+            watcher = Watch_Folder(tmp_dir, seen.append, interval=0)
+            self.assertEqual([], watcher.poll(), "nothing dropped yet")
+
+            shutil.copy(self.im_path, os.path.join(tmp_dir, 'a.jpg'))
+            #files which aren't images are ignored
+            with open(os.path.join(tmp_dir, 'notes.txt'), 'w') as outStrm:
+                outStrm.write('not an image')
+
+            self.assertEqual([], watcher.poll(), "an image is only queued "+
+                    "once it hasn't changed between two polls")
+            self.assertEqual(['a.jpg'], watcher.poll(), "stable image queued")
+            self.assertEqual(1, watcher.process_queue(), "one image processed")
+            self.assertEqual([os.path.join(tmp_dir, 'a.jpg')], seen,
+                    "handler called with the path of the image")
+            self.assertEqual([], watcher.poll(), "processed images aren't "+
+                    "queued again")
+
+            #restarting, the ledger should stop the image been processed again
+            watcher = Watch_Folder(tmp_dir, seen.append, interval=0)
+            watcher.run(max_polls=3)
+            self.assertEqual(1, len(seen), "ledger is read on a restart")
+            self.assertEqual({'a.jpg': 'done'}, watcher.processed,
+                    "status of the processed image")
+
+    def test_failed(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            def handler(path):
+                raise ImageError("broken image")
+
+            shutil.copy(self.im_path, os.path.join(tmp_dir, 'b.png'))
+            watcher = Watch_Folder(tmp_dir, handler, interval=0)
+            watcher.run(max_polls=2)
+            self.assertEqual({'b.png': 'failed'}, watcher.processed,
+                    "failed images are recorded so they aren't retried")
+
+        with self.assertRaises(PathError):
+            Watch_Folder('../not-a-directory/', handler)